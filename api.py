@@ -0,0 +1,181 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import zlib
+
+from flask import Response, request
+
+# Page size when ?limit is not given, and the largest page a request may ask for
+DEFAULT_LIMIT = 100
+MAX_LIMIT = int(os.getenv("API_MAX_LIMIT", "10000"))
+# Rows serialized per streamed chunk
+CHUNK_ROWS = 500
+# Pages with more rows than this are gzip-compressed for clients that accept it
+GZIP_MIN_ROWS = 50
+
+# Offsets into the filtered incidents that locations carry for the dashboard's own use
+HIDDEN_LOCATION_FIELDS = ("row_start", "row_stop")
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# Cursors are opaque to clients: the dataset version and the offset of the next row.
+# Row order is fixed within a version, so an offset always resumes where the page ended.
+def encode_cursor(version, offset):
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, version):
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        cursor_version, _, offset = text.rpartition(":")
+        offset = int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ApiError(400, "Invalid cursor.")
+    if offset < 0:
+        raise ApiError(400, "Invalid cursor.")
+    if cursor_version != version:
+        raise ApiError(410, "The dataset changed since this cursor was issued; start again without a cursor.")
+    return offset
+
+
+# Field names from a comma-separated ?fields= value. Column names may contain commas
+# ("Custom location (Lat, Lon)"), so the longest run of pieces naming a column is taken
+# as one field; pieces that name none are returned as they are, to be reported unknown.
+def split_fields(text, columns):
+    pieces = text.split(",")
+    fields = []
+    start = 0
+    while start < len(pieces):
+        stop = next((stop for stop in range(len(pieces), start, -1) if ",".join(pieces[start:stop]).strip() in columns), start + 1)
+        field = ",".join(pieces[start:stop]).strip()
+        if field:
+            fields.append(field)
+        start = stop
+    return fields
+
+
+# Validate the query string into (filter spec, fields, limit, offset)
+def parse_query(data, make_filter_spec, columns):
+    args = request.args
+    column, value = args.get("column"), args.get("value")
+    spec = None
+    if column is not None or value is not None:
+        if not column or not value or not value.strip():
+            raise ApiError(400, "column and value must be given together.")
+        if column not in data["df"].columns:
+            raise ApiError(400, f"Unknown filter column: {column}.")
+        # Dates and coordinates are neither matched as text nor compared as numbers
+        if column not in data["string_cols"] and column not in data["numerical_cols"]:
+            raise ApiError(400, f"{column} cannot be filtered on; filter on a text or numerical column.")
+        try:
+            spec = make_filter_spec(data, column, value)
+        except ValueError:
+            raise ApiError(400, f"{column} is numerical; value must be a finite number.")
+
+    fields = columns
+    if any(args.getlist("fields")):
+        fields = list(dict.fromkeys(field for text in args.getlist("fields") for field in split_fields(text, columns)))
+        unknown = [field for field in fields if field not in columns]
+        if unknown:
+            raise ApiError(400, f"Unknown fields: {', '.join(unknown)}.")
+
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError(400, "limit must be an integer.")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(400, f"limit must be between 1 and {MAX_LIMIT}.")
+
+    offset = decode_cursor(args["cursor"], data["version"]) if args.get("cursor") else 0
+    return spec, fields, limit, offset
+
+
+# The JSON document in chunks: the page's metadata, then its records CHUNK_ROWS at a time.
+# It runs while the response is sent, after the view returned, so it only uses its arguments.
+def page_chunks(meta, frame, start, stop, fields):
+    yield json.dumps(meta)[:-1] + ', "data": ['
+    for chunk_start in range(start, stop, CHUNK_ROWS):
+        records = frame.iloc[chunk_start:min(chunk_start + CHUNK_ROWS, stop)][fields].to_json(orient="records", date_format="iso")
+        yield ("," if chunk_start > start else "") + records[1:-1]
+    yield "]}"
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode())
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def error_response(status, message):
+    return Response(json.dumps({"error": message}), status=status, mimetype="application/json")
+
+
+# Read-only JSON endpoints over the incident data, sharing the dashboard's filters and caches:
+#   GET /api/incidents  one record per incident
+#   GET /api/locations  one record per location, with its incident count
+# Both take ?column=&value= (the dashboard's filter), ?fields=a,b or ?fields=a&fields=b (projection),
+# ?limit= and ?cursor= (the next_cursor of the previous page).
+def install(server, get_dataset, get_filtered_frames, make_filter_spec):
+    def serve(kind):
+        data = get_dataset()
+        df_columns = list(data["df"].columns)
+        location_columns = [col for col in data["grouped_df"].columns if col not in HIDDEN_LOCATION_FIELDS]
+        columns = df_columns if kind == "incidents" else location_columns
+        try:
+            spec, fields, limit, offset = parse_query(data, make_filter_spec, columns)
+        except ApiError as error:
+            return error_response(error.status, error.message)
+
+        # A page is fully determined by the dataset version and the normalized query, so
+        # clients and proxies can revalidate it with If-None-Match without it being rebuilt
+        query = json.dumps([kind, spec, fields, limit, offset])
+        etag = f"{data['version']}-{hashlib.sha1(query.encode()).hexdigest()[:16]}"
+        headers = {"Cache-Control": "public, no-cache", "Vary": "Accept-Encoding"}
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304, headers=headers)
+            response.set_etag(etag, weak=True)
+            return response
+
+        try:
+            filtered_df, filtered_grouped_df = get_filtered_frames(data, spec)
+        except re.error:
+            return error_response(400, f"Invalid pattern for {spec['column']}: {spec['value']}.")
+        frame = filtered_df if kind == "incidents" else filtered_grouped_df
+        if offset > len(frame):
+            return error_response(400, "Invalid cursor.")
+
+        stop = min(offset + limit, len(frame))
+        meta = {
+            "version": data["version"],
+            "total": len(frame),
+            "offset": offset,
+            "count": stop - offset,
+            "next_cursor": encode_cursor(data["version"], stop) if stop < len(frame) else None,
+        }
+        chunks = page_chunks(meta, frame, offset, stop, fields)
+        if stop - offset > GZIP_MIN_ROWS and "gzip" in request.accept_encodings:
+            chunks = gzip_chunks(chunks)
+            headers["Content-Encoding"] = "gzip"
+        response = Response(chunks, mimetype="application/json", headers=headers)
+        response.set_etag(etag, weak=True)
+        return response
+
+    @server.route("/api/incidents")
+    def api_incidents():
+        return serve("incidents")
+
+    @server.route("/api/locations")
+    def api_locations():
+        return serve("locations")
@@ -1,77 +1,93 @@
 from custom_react import app  # Import the app with custom React version
 import dash
-import pandas as pd
-from dash import dcc, html, Input, Output, State, ctx
+import math
+import numpy as np
+from dash import dcc, html, Input, Output, State, Patch, ClientsideFunction, ctx
 import plotly
 import plotly.express as px
-import re
+import plotly.graph_objects as go
 import os
+import re
+import sqlite3
+import threading
+from api import install as install_api
+from count_cube import CountCube
+from ingest import FIRST_COLUMNS, DatasetWatcher, load_dataset, group_view
+from metrics import configure_logging, install as install_metrics, instrument, log, record_rows
+from preview_store import LEGACY_JSON_FILE, STORE_FILE, PreviewStore
+from result_cache import ResultCache
+from search_index import REGEX_CHARS, FilterIndex, scan_rows
+from spatial import SpatialIndex, viewport_bounds, viewport_from_relayout
 
 app.title = "BESS Fire Incidents"
 
-# Print Dash and Plotly versions
-print(f"Dash version: {dash.__version__}")
-print(f"Plotly version: {plotly.__version__}")
-
-# Load the Excel file
-df = pd.read_excel("Failure_DB_List_2_updated.xlsx", sheet_name="Failure_DB_List_2_updated")
-print(f"Initial DataFrame rows: {len(df)}")
-print(f"DataFrame columns: {df.columns.tolist()}")
-
-# Clean missing values: separate numerical and non-numerical columns
-numerical_cols = df.select_dtypes(include=['float64', 'int64']).columns
-string_cols = df.select_dtypes(include=['object']).columns
-df[numerical_cols] = df[numerical_cols].fillna(0)
-df[string_cols] = df[string_cols].fillna("-")
-
-# Debug lat/lon extraction
-print("Sample of Custom location (Lat, Lon) column:")
-print(df["Custom location (Lat, Lon)"].head(10))
-
-# Extract lat/lon with improved error handling
-def extract_lat_lon(coord, part):
+configure_logging()
+log.info("startup", extra={"dash_version": dash.__version__, "plotly_version": plotly.__version__})
+
+# Filtered frames stay on the server; the browser only holds the filter spec
+result_cache = ResultCache()
+# Cards and bar figures are small and alike, so they are bounded by number rather than bytes
+card_cache = ResultCache(max_bytes=None, max_entries=5000)
+figure_cache = ResultCache(max_bytes=None, max_entries=256)
+# Base maps hold the located rows, their figure and (when clustered) a spatial index, so
+# one can run to megabytes; they get their own budget in bytes
+map_cache = ResultCache(max_bytes=int(os.getenv("MAP_CACHE_MB", "32")) * 1024 * 1024)
+
+# Dimensions offered by "Plot Incidents by", counted once per dataset (those present in it)
+PLOT_COLUMNS = ["Country", "Year of Incident", "Cause", "Integrator", "Enclosure Type"]
+
+
+# Make `new_dataset` (as returned by load_dataset) the data every callback works on.
+# Everything derived from it is built first and swapped in with one assignment, so a
+# callback reads `dataset` once and works on a single consistent version throughout;
+# cache keys carry that version, so results of the previous one are never reused.
+def use_dataset(new_dataset):
+    global dataset
+    # Substring/exact-match indexes so filters resolve to row ids without scanning df
+    filter_index = FilterIndex(new_dataset["df"], new_dataset["string_cols"], new_dataset["numerical_cols"])
+    # Per-dimension incident counts for the bar plot
+    count_cube = CountCube(new_dataset["df"], PLOT_COLUMNS)
+    dataset = dict(new_dataset, filter_index=filter_index, count_cube=count_cube)
+    for cache in (result_cache, card_cache, figure_cache, map_cache):
+        cache.clear()
+    df = dataset["df"]
+    log.info("dataset_loaded", extra={
+        "version": dataset["version"],
+        "rows": len(df),
+        "located_rows": int((df["lat"].notnull() & df["lon"].notnull()).sum()),
+        "locations": len(dataset["grouped_df"])
+    })
+
+
+# Load the cleaned incident data (from the binary snapshot when the workbook is unchanged)
+use_dataset(load_dataset())
+
+# Link previews written by fetch_previews.py. Opening the store creates it (and imports a
+# legacy url_previews.json) in the working directory; when that fails the dashboard runs
+# without previews, as it would before any were fetched.
+def open_preview_store(path=STORE_FILE, legacy_json=LEGACY_JSON_FILE):
     try:
-        if coord == "-" or not isinstance(coord, str) or "," not in coord:
-            return None
-        parts = coord.split(",")
-        value = float(parts[0].strip()) if part == "lat" else float(parts[1].strip())
-        # Validate lat/lon ranges
-        if part == "lat" and not (-90 <= value <= 90):
-            return None
-        if part == "lon" and not (-180 <= value <= 180):
-            return None
-        return value
-    except (ValueError, IndexError):
+        return PreviewStore(path, legacy_json)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        log.warning("preview_store_unavailable", extra={"path": path, "error": repr(e)})
         return None
 
-df["lat"] = df["Custom location (Lat, Lon)"].apply(lambda x: extract_lat_lon(x, "lat"))
-df["lon"] = df["Custom location (Lat, Lon)"].apply(lambda x: extract_lat_lon(x, "lon"))
-print(f"Rows after lat/lon extraction: {len(df)}")
-print(f"Rows with valid lat/lon: {len(df[df['lat'].notnull() & df['lon'].notnull()])}")
-
-# Normalize Location values (ensure consistency for IDs)
-df["Location"] = df["Location"].str.strip().str.replace(r'[^a-zA-Z0-9\s]', '', regex=True).str.replace(r'\s+', ' ', regex=True)
-print(f"Unique Locations before grouping: {len(df['Location'].unique())}")
 
-# Extract Year of Incident if a date column exists
-if "Date of Incident" in df.columns:
-    df["Year of Incident"] = pd.to_datetime(df["Date of Incident"], errors="coerce").dt.year
-else:
-    print("No 'Date of Incident' column found to extract Year of Incident.")
+preview_store = open_preview_store()
+PREVIEW_URL_COLUMNS = ["Source URL 1", "Source URL 2", "Source URL 3"]
 
-# Group by Location, aggregating other columns
-agg_dict = {col: "first" if col in ["lat", "lon", "Country"] else list for col in df.columns if col not in ["Location"]}
-grouped_df = df.groupby("Location").agg(agg_dict).reset_index()
+# Cards are rendered in pages; the window always extends CARD_BUFFER past the selected card
+CARD_PAGE_SIZE = 25
+CARD_BUFFER = 10
+# Map results with more located sites than this are clustered per viewport
+CLUSTER_MIN_POINTS = int(os.getenv("MAP_CLUSTER_MIN_POINTS", "1000"))
+# How often each server process checks the workbook for changes (0 = never reload)
+DATASET_RELOAD_SECONDS = float(os.getenv("DATASET_RELOAD_SECONDS", "30"))
 
-# Add a column for the number of incidents
-grouped_df["Incident Count"] = df.groupby("Location").size().values
-
-# Add an id column for consistency (normalize to match selected_location)
-grouped_df["id"] = grouped_df["Location"].str.strip().str.replace(r'[^a-zA-Z0-9\s]', '', regex=True).str.replace(r'\s+', ' ', regex=True)
-print(f"Grouped DataFrame rows: {len(grouped_df)}")
-print(f"Grouped DataFrame columns: {grouped_df.columns.tolist()}")
-print(f"Grouped Locations in grouped_df: {grouped_df['Location'].tolist()}")
-print(f"Grouped IDs in grouped_df: {grouped_df['id'].tolist()}")
+# Filters match text columns by substring and numerical columns exactly; other columns
+# (dates, coordinates) can't be filtered on
+def is_filterable(data, column):
+    return column in data["string_cols"] or column in data["numerical_cols"]
 
 # Power color helper
 def get_mw_color(mw):
@@ -110,7 +126,7 @@ app.layout = html.Div([
             html.Label("Filter by Column:"),
             dcc.Dropdown(
                 id="filter-column",
-                options=[{"label": col, "value": col} for col in df.columns if col not in ["lat", "lon", "id"]],
+                options=[{"label": col, "value": col} for col in dataset["df"].columns if is_filterable(dataset, col)],
                 value="Country",
                 style={"width": "200px", "margin": "10px"}
             ),
@@ -128,7 +144,10 @@ app.layout = html.Div([
         # Dashboard content (cards on left, map and chart on right)
         html.Div([
             # Left section (cards)
-            html.Div(
+            html.Div([
+                html.Div(id="card-list"),
+                html.Button("Load more", id="load-more-cards", n_clicks=0, style={"display": "none"})
+            ],
                 id="left-section",
                 className="left-section",
                 style={"width": "40%", "overflowY": "auto", "padding": "10px", "borderRight": "1px solid #ccc", "maxHeight": "80vh"}
@@ -141,7 +160,10 @@ app.layout = html.Div([
                     id="map-section",
                     children=[
                         html.H3("Incident Map", style={"textAlign": "center"}),
-                        html.Div(id="right-section", style={"height": "600px", "width": "100%"})
+                        html.Div([
+                            html.Div(id="map-message"),
+                            dcc.Graph(id="map-graph", style={"display": "none"})
+                        ], id="right-section", style={"height": "600px", "width": "100%"})
                     ]
                 ),
 
@@ -150,11 +172,7 @@ app.layout = html.Div([
                     html.Label("Plot Incidents by:"),
                     dcc.Dropdown(
                         id="plot-column",
-                        options=[
-                            {"label": "Country", "value": "Country"}
-                        ] + (
-                            [{"label": "Year of Incident", "value": "Year of Incident"}] if "Year of Incident" in df.columns else []
-                        ),
+                        options=[{"label": col, "value": col} for col in PLOT_COLUMNS if col in dataset["count_cube"]],
                         value="Country",
                         style={"width": "200px", "margin": "10px"}
                     ),
@@ -165,75 +183,114 @@ app.layout = html.Div([
     ], id="app-container", style={"display": "flex", "flexDirection": "column", "minHeight": "100vh"}),
 
     dcc.Store(id="selected-location", data=None),
-    dcc.Store(id="filtered-df", data=df.to_dict("records")),
-    dcc.Store(id="filtered-grouped-df", data=grouped_df.to_dict("records")),
+    dcc.Store(id="filter-spec", data=None),
+    dcc.Store(id="card-limit", data=CARD_PAGE_SIZE),
+    dcc.Store(id="rendered-cards", data=None),
+    dcc.Store(id="rendered-map", data=None),
+    # Written in the browser by assets/selection.js: the selected location's coordinates, the
+    # viewport a clustered map must be re-queried for, and a card the window has to reach
+    dcc.Store(id="map-focus", data=None),
+    dcc.Store(id="map-viewport", data=None),
+    dcc.Store(id="card-target", data=None),
     html.Div(id="debug-output"),
-    html.Div(id="debug-log", style={"color": "red", "padding": "10px"}),
-    html.Div(id="scroll-script-container", style={"display": "none"})
+    html.Div(id="debug-log", style={"color": "red", "padding": "10px"})
 ])
 
+# Normalize a filter into the small spec carried by the filter-spec store (None = no filter).
+# Filters that match the same rows get the same spec, and so share cache entries and ETags:
+# surrounding whitespace is dropped, and plain substrings (matched ignoring case) are
+# lowercased as the filter index compares them. Raises ValueError for a numerical column
+# unless the value is a finite number (NaN would never equal a cached key).
+def make_filter_spec(data, filter_column, filter_value):
+    if filter_column in data["numerical_cols"]:
+        value = float(filter_value)
+        if not math.isfinite(value):
+            raise ValueError(f"not a finite number: {filter_value}")
+        return {"column": filter_column, "value": value}
+    value = str(filter_value).strip()
+    if not REGEX_CHARS.intersection(value):
+        value = value.lower()
+    return {"column": filter_column, "value": value}
+
+
+def filter_cache_key(spec):
+    return None if spec is None else (spec["column"], spec["value"])
+
+
+def compute_filter(data, spec):
+    df = data["df"]
+    rows = data["filter_index"].lookup(spec["column"], spec["value"])
+    if rows is None:
+        rows = scan_rows(df, spec["column"], spec["value"], numerical=spec["column"] in data["numerical_cols"])
+    return df.iloc[rows], group_view(df, data["groups"], rows)
+
+
+# Resolve a filter spec to its (filtered_df, filtered_grouped_df) frames, kept server-side
+def get_filtered_frames(data, spec):
+    if spec is None:
+        return data["df"], data["grouped_df"]
+    return result_cache.get_or_compute((data["version"], filter_cache_key(spec)), lambda: compute_filter(data, spec))
+
+
 # Callback to filter the DataFrame
 @app.callback(
-    Output("filtered-df", "data"),
-    Output("filtered-grouped-df", "data"),
+    Output("filter-spec", "data"),
     Output("debug-log", "children"),
     Input("apply-filter", "n_clicks"),
     Input("reset-filter", "n_clicks"),
     State("filter-column", "value"),
     State("filter-value", "value")
 )
+@instrument
 def filter_dataframe(apply_clicks, reset_clicks, filter_column, filter_value):
     ctx_triggered = ctx.triggered_id
-    debug_msg = f"Filter triggered by: {ctx_triggered}, filter_column: {filter_column}, filter_value: {filter_value}"
-    print(debug_msg)
+    log.debug("filter", extra={"trigger": ctx_triggered, "column": filter_column, "value": filter_value})
 
     if ctx_triggered == "reset-filter":
-        grouped = grouped_df.to_dict("records")
-        return df.to_dict("records"), grouped, "Filter reset."
-
-    if ctx_triggered == "apply-filter" and filter_column and filter_value:
-        filtered_df = df.copy()
-        if filter_column in numerical_cols:
-            try:
-                filter_value = float(filter_value)
-                filtered_df = filtered_df[filtered_df[filter_column] == filter_value]
-            except ValueError:
-                return df.to_dict("records"), grouped_df.to_dict("records"), "Invalid numerical filter value."
-        else:
-            filtered_df = filtered_df[filtered_df[filter_column].str.contains(filter_value, case=False, na=False)]
-        
-        if not filtered_df.empty:
-            filtered_grouped_df = filtered_df.groupby("Location").agg({
-                col: "first" if col in ["lat", "lon", "Country"] else list for col in filtered_df.columns if col not in ["Location"]
-            }).reset_index()
-            filtered_grouped_df["Incident Count"] = filtered_df.groupby("Location").size().values
-            filtered_grouped_df["id"] = filtered_grouped_df["Location"].str.strip().str.replace(r'[^a-zA-Z0-9\s]', '', regex=True).str.replace(r'\s+', ' ', regex=True)
-        else:
-            filtered_grouped_df = filtered_df.groupby("Location").agg({
-                col: "first" if col in ["lat", "lon", "Country"] else list for col in filtered_df.columns if col not in ["Location"]
-            }).reset_index()
-            filtered_grouped_df["Incident Count"] = 0
-            filtered_grouped_df["id"] = filtered_grouped_df["Location"].str.strip().str.replace(r'[^a-zA-Z0-9\s]', '', regex=True).str.replace(r'\s+', ' ', regex=True)
-
-        return filtered_df.to_dict("records"), filtered_grouped_df.to_dict("records"), "Filter applied."
-    
-    grouped = grouped_df.to_dict("records")
-    return df.to_dict("records"), grouped, "No filter applied."
+        return None, "Filter reset."
+
+    if ctx_triggered == "apply-filter" and filter_column and filter_value and filter_value.strip():
+        data = dataset
+        if not is_filterable(data, filter_column):
+            return None, f"{filter_column} cannot be filtered on."
+        try:
+            spec = make_filter_spec(data, filter_column, filter_value)
+        except ValueError:
+            return None, "Invalid numerical filter value."
+        # Populate the cache here so the dependent callbacks hit it
+        try:
+            get_filtered_frames(data, spec)
+        except re.error:
+            return None, "Invalid filter pattern."
+        return spec, "Filter applied."
+
+    return None, "No filter applied."
 
 # Callback to generate the bar plot
 @app.callback(
     Output("bar-plot", "figure"),
-    Input("filtered-df", "data"),
+    Input("filter-spec", "data"),
     Input("plot-column", "value")
 )
-def update_bar_plot(filtered_df_data, plot_column):
-    print(f"Bar plot callback triggered with plot_column: {plot_column}")
-    filtered_df = pd.DataFrame(filtered_df_data)
-    print(f"Bar plot filtered_df rows: {len(filtered_df)}")
+@instrument
+def update_bar_plot(filter_spec, plot_column):
+    data = dataset
+    filtered_df, _ = get_filtered_frames(data, filter_spec)
+    record_rows("update_bar_plot", len(filtered_df))
+    # Figures are memoized per (data version, filter, column), so switching back and forth is free
+    return figure_cache.get_or_compute(
+        ("bar", data["version"], filter_cache_key(filter_spec), plot_column),
+        lambda: build_bar_plot(data, filter_spec, filtered_df, plot_column)
+    )
+
+
+def build_bar_plot(data, filter_spec, filtered_df, plot_column):
     if filtered_df.empty:
         return px.bar(title="No data to plot")
 
-    plot_data = filtered_df.groupby(plot_column).size().reset_index(name="Count")
+    # filtered_df keeps df's positional index, so its index holds the filter's rows
+    rows = None if filter_spec is None else filtered_df.index.to_numpy()
+    plot_data = data["count_cube"].counts(plot_column, rows)
     fig = px.bar(
         plot_data,
         x=plot_column,
@@ -249,179 +306,352 @@ def update_bar_plot(filtered_df_data, plot_column):
     )
     return fig
 
-# Cards generator with scroll script injection
-@app.callback(
-    Output("left-section", "children"),
-    Output("scroll-script-container", "children"),
-    Input("selected-location", "data"),
-    Input("filtered-grouped-df", "data")
-)
-def render_cards(selected_id, filtered_grouped_df_data):
-    print(f"Render cards triggered with selected_id: '{selected_id}'")
-    filtered_grouped_df = pd.DataFrame(filtered_grouped_df_data)
-    print(f"Render cards filtered_grouped_df rows: {len(filtered_grouped_df)}")
-    print(f"Render cards columns: {filtered_grouped_df.columns.tolist()}")
-    print(f"Render cards Locations: {filtered_grouped_df['Location'].tolist()}")
-    print(f"Render cards IDs: {filtered_grouped_df['id'].tolist()}")
-    if filtered_grouped_df.empty:
-        return html.Div("No data matches the filter criteria.", style={"color": "red", "textAlign": "center"}), []
-
-    cards = []
-    for _, row in filtered_grouped_df.iterrows():
-        is_selected = row["id"] == selected_id
-        card_class = "card selected" if is_selected else "card"
-
-        # Special handling for certain columns
-        capacities = row["Capacity (MW)"] if isinstance(row["Capacity (MW)"], list) else [row["Capacity (MW)"]]
-        power_texts = []
-        for mw in capacities:
-            color = get_mw_color(mw)
-            power_texts.append(html.Div(f"{mw} MW", style={"fontWeight": "bold", "fontSize": "20px", "color": color}))
-
-        flag_url = get_flag_url(row["Country"])
-        flag_img = html.Img(src=flag_url, style={"height": "30px"}) if flag_url else None
-
-        images = []
-        source_urls = row["Source URL 1"] if isinstance(row["Source URL 1"], list) else [row["Source URL 1"]]
-        for url in source_urls:
-            if url != "-" and isinstance(url, str) and any(ext in url for ext in [".jpg", ".png", ".jpeg", ".webp"]):
-                images.append(html.Img(src=url, style={"width": "100%", "height": "auto", "marginTop": "10px"}))
-
-        # Dynamically display all columns (excluding certain ones)
-        details = []
-        exclude_columns = ["lat", "lon", "id", "Location", "Capacity (MW)", "Source URL 1", "Incident Count"]
-        for col in filtered_grouped_df.columns:
-            if col in exclude_columns:
-                continue
+# Link previews for a card's source URLs, looked up per card in the preview store
+def build_previews(incidents):
+    urls = [
+        url
+        for col in PREVIEW_URL_COLUMNS if col in incidents.columns
+        for url in incidents[col].tolist() if isinstance(url, str) and url.startswith(("http://", "https://"))
+    ]
+    previews = preview_store.get_many(urls) if preview_store is not None else {}
+    blocks = []
+    for url in dict.fromkeys(urls):
+        preview = previews.get(url)
+        if not preview or preview["status"] != "ok":
+            continue
+        blocks.append(html.Div([
+            html.Img(src=preview["image"], style={"maxWidth": "100%", "maxHeight": "120px", "display": "block"}) if preview["image"] else None,
+            html.A(html.Strong(preview["title"] or url), href=url, target="_blank"),
+            html.P(preview["description"], style={"margin": "2px 0"}) if preview["description"] else None
+        ], className="preview", style={"marginTop": "8px"}))
+    return blocks
+
+
+# Build one location card from its (filtered) incidents
+def build_card(row, incidents, is_selected):
+    card_class = "card selected" if is_selected else "card"
+
+    # Special handling for certain columns
+    capacities = incidents["Capacity (MW)"].tolist()
+    power_texts = []
+    for mw in capacities:
+        color = get_mw_color(mw)
+        power_texts.append(html.Div(f"{mw} MW", style={"fontWeight": "bold", "fontSize": "20px", "color": color}))
+
+    flag_url = get_flag_url(row["Country"])
+    flag_img = html.Img(src=flag_url, style={"height": "30px"}) if flag_url else None
+
+    images = []
+    source_urls = incidents["Source URL 1"].tolist()
+    for url in source_urls:
+        if url != "-" and isinstance(url, str) and any(ext in url for ext in [".jpg", ".png", ".jpeg", ".webp"]):
+            images.append(html.Img(src=url, style={"width": "100%", "height": "auto", "marginTop": "10px"}))
+
+    # Dynamically display all columns (excluding certain ones)
+    details = []
+    exclude_columns = ["lat", "lon", "id", "Location", "Capacity (MW)", "Source URL 1", "Incident Count"]
+    for col in incidents.columns:
+        if col in exclude_columns:
+            continue
+        if col in FIRST_COLUMNS:
             value = row[col]
-            if isinstance(value, list):
-                value = ", ".join(map(str, value)) if value else "-"
-            details.append(
-                html.Div([
-                    html.Span(f"{col}: ", style={"fontWeight": "bold"}),
-                    html.Span(str(value))
-                ])
-            )
-
-        # Add Incident Count separately
-        incident_count = row["Incident Count"]
+        else:
+            value = ", ".join(map(str, incidents[col].tolist())) or "-"
         details.append(
             html.Div([
-                html.Span("Number of Incidents: ", style={"fontWeight": "bold"}),
-                html.Span(str(incident_count))
+                html.Span(f"{col}: ", style={"fontWeight": "bold"}),
+                html.Span(str(value))
             ])
         )
 
-        card = html.Div([
-            html.H3(f"{row['Location']} ({incident_count} incidents)"),
-            html.Div(power_texts + [flag_img], style={"display": "flex", "gap": "10px", "alignItems": "center"}),
-            html.Div(details),
-            html.Div(images)
-        ],
-        id=f"card-{row['id']}",
-        className=card_class,
-        **{
-            "data-location": row["Location"],
-            "data-lat": row["lat"],
-            "data-lon": row["lon"]
-        },
-        style={"border": "1px solid #ccc", "borderRadius": "10px", "backgroundColor": "#f9f9f9", "cursor": "pointer", "marginBottom": "10px", "padding": "10px"},
-        n_clicks=0)
-        cards.append(card)
-
-    # Inject JavaScript to scroll to the selected card
-    scroll_script = []
-    if selected_id:
-        scroll_script = html.Script(f"""
-            setTimeout(() => {{
-                console.log("Server-side scroll triggered for selected_id: '{selected_id}'");
-                const targetCard = document.getElementById('card-{selected_id}');
-                const cardStack = document.getElementById('left-section');
-                if (targetCard && cardStack) {{
-                    console.log("Scrolling to card: 'card-{selected_id}'");
-                    cardStack.scrollTop = targetCard.offsetTop - cardStack.offsetTop - 10;
-                }} else {{
-                    console.log("Target card or card stack not found:", targetCard, cardStack);
-                }}
-            }}, 100);
-        """)
-
-    return cards, scroll_script
-
-# Simplified map rendering callback
+    # Add Incident Count separately
+    incident_count = row["Incident Count"]
+    details.append(
+        html.Div([
+            html.Span("Number of Incidents: ", style={"fontWeight": "bold"}),
+            html.Span(str(incident_count))
+        ])
+    )
+
+    return html.Div([
+        html.H3(f"{row['Location']} ({incident_count} incidents)"),
+        html.Div(power_texts + [flag_img], style={"display": "flex", "gap": "10px", "alignItems": "center"}),
+        html.Div(details),
+        html.Div(build_previews(incidents)),
+        html.Div(images)
+    ],
+    id={"type": "card", "index": row["id"]},
+    className=card_class,
+    **{
+        "data-location": row["Location"],
+        "data-lat": row["lat"],
+        "data-lon": row["lon"]
+    },
+    style={"border": "1px solid #ccc", "borderRadius": "10px", "backgroundColor": "#f9f9f9", "cursor": "pointer", "marginBottom": "10px", "padding": "10px"},
+    n_clicks=0)
+
+
+# Cards are memoized per (data version, filter, location, selected) so re-renders reuse them.
+# The key also carries the preview store's revision, so previews fetched since show up.
+def get_card(data, filter_spec, filtered_df, filtered_grouped_df, position, selected_id):
+    row = filtered_grouped_df.iloc[position]
+    is_selected = row["id"] == selected_id
+    key = (data["version"], filter_cache_key(filter_spec), row["id"], is_selected,
+           preview_store.revision() if preview_store is not None else None)
+    return card_cache.get_or_compute(
+        key, lambda: build_card(row, filtered_df.iloc[row["row_start"]:row["row_stop"]], is_selected)
+    )
+
+
+# Grow the card window as the list is scrolled; start over when the filter changes
 @app.callback(
-    Output("right-section", "children"),
-    Input("selected-location", "data"),
-    Input("filtered-grouped-df", "data")
+    Output("card-limit", "data"),
+    Input("load-more-cards", "n_clicks"),
+    Input("filter-spec", "data"),
+    State("rendered-cards", "data")
 )
-def render_map(selected_location, filtered_grouped_df_data):
-    print(f"Render map triggered with selected_location: '{selected_location}'")
-    filtered_grouped_df = pd.DataFrame(filtered_grouped_df_data)
-    print(f"Render map filtered_grouped_df rows: {len(filtered_grouped_df)}")
-    print(f"Render map Locations: {filtered_grouped_df['Location'].tolist()}")
-    if filtered_grouped_df.empty:
-        return html.Div("No data matches the filter criteria.", style={"color": "red", "textAlign": "center"})
-
-    # Filter rows with valid lat/lon for the map
-    map_df = filtered_grouped_df[filtered_grouped_df["lat"].notnull() & filtered_grouped_df["lon"].notnull()]
-    print(f"Map rows with развит lat/lon: {len(map_df)}")
-    if map_df.empty:
-        return html.Div("No valid lat/lon data for map.", style={"color": "red", "textAlign": "center"})
-
-    fig = px.scatter_mapbox(
-        map_df,
-        lat="lat",
-        lon="lon",
-        hover_name="Location",
-        size="Incident Count",
-        zoom=2,
-        height=600
-    )
-    fig.update_layout(mapbox_style="open-street-map", margin={"r":0,"t":0,"l":0,"b":0})
+@instrument
+def update_card_limit(load_clicks, filter_spec, rendered):
+    if ctx.triggered_id == "load-more-cards" and rendered:
+        return rendered["limit"] + CARD_PAGE_SIZE
+    return CARD_PAGE_SIZE
 
-    colors = ["red" if loc == selected_location else "blue" for loc in map_df["Location"]]
-    print(f"Marker colors: {colors}")
-    fig.update_traces(marker=dict(color=colors))
 
-    if selected_location and selected_location in map_df["Location"].values:
-        selected_row = map_df[map_df["Location"] == selected_location].iloc[0]
-        fig.update_layout(
-            mapbox_center={"lat": selected_row["lat"], "lon": selected_row["lon"]},
-            mapbox_zoom=10
+# Cards generator. Only the first `card-limit` cards (extended to reach the selected one) are
+# rendered, and when the result set is unchanged only the newly reached cards are appended.
+# Selection highlighting and scrolling happen in the browser (assets/selection.js), which
+# sets card-target when the selected card lies beyond the rendered window.
+@app.callback(
+    Output("card-list", "children"),
+    Output("load-more-cards", "style"),
+    Output("rendered-cards", "data"),
+    Input("filter-spec", "data"),
+    Input("card-limit", "data"),
+    Input("card-target", "data"),
+    State("selected-location", "data"),
+    State("rendered-cards", "data")
+)
+@instrument
+def render_cards(filter_spec, card_limit, card_target, selected_id, rendered):
+    data = dataset
+    filtered_df, filtered_grouped_df = get_filtered_frames(data, filter_spec)
+    record_rows("render_cards", len(filtered_grouped_df))
+    if filtered_grouped_df.empty:
+        return html.Div("No data matches the filter criteria.", style={"color": "red", "textAlign": "center"}), {"display": "none"}, None
+
+    ids = filtered_grouped_df["id"].to_numpy()
+    same_results = bool(rendered) and rendered["version"] == data["version"] and rendered["filter"] == filter_spec
+    limit = max(card_limit or CARD_PAGE_SIZE, rendered["limit"] if same_results else 0)
+    selected_positions = np.flatnonzero(ids == selected_id)
+    if len(selected_positions):
+        limit = max(limit, selected_positions[0] + 1 + CARD_BUFFER)
+    limit = int(min(limit, len(ids)))
+    state = {"version": data["version"], "filter": filter_spec, "limit": limit}
+    load_more_style = {"display": "block" if limit < len(ids) else "none", "margin": "10px auto"}
+
+    def card(position):
+        return get_card(data, filter_spec, filtered_df, filtered_grouped_df, position, selected_id)
+
+    if same_results:
+        if limit == rendered["limit"]:
+            return dash.no_update, dash.no_update, dash.no_update
+        cards = Patch()
+        for position in range(rendered["limit"], limit):
+            cards.append(card(position))
+    else:
+        cards = [card(position) for position in range(limit)]
+
+    return cards, load_more_style, state
+
+# Base map for a filter result, cached so selection changes never rebuild it.
+# Returns (map_df, figure, spatial_index); figure is None when no location has valid
+# lat/lon, and spatial_index is only built for results large enough to be clustered.
+def get_base_map(data, filter_spec):
+    def build():
+        _, filtered_grouped_df = get_filtered_frames(data, filter_spec)
+        # Filter rows with valid lat/lon for the map
+        map_df = filtered_grouped_df[filtered_grouped_df["lat"].notnull() & filtered_grouped_df["lon"].notnull()]
+        if map_df.empty:
+            return map_df, None, None
+        if len(map_df) > CLUSTER_MIN_POINTS:
+            # Markers are filled in per viewport by clustered_trace()
+            fig = go.Figure(go.Scattermapbox(mode="markers", hoverinfo="text"))
+            fig.update_layout(
+                mapbox_style="open-street-map", margin={"r":0,"t":0,"l":0,"b":0}, height=600,
+                mapbox_center={"lat": float(map_df["lat"].mean()), "lon": float(map_df["lon"].mean())}, mapbox_zoom=2
+            )
+            return map_df, fig, SpatialIndex(map_df["lat"], map_df["lon"], map_df["Incident Count"])
+        fig = px.scatter_mapbox(
+            map_df,
+            lat="lat",
+            lon="lon",
+            hover_name="Location",
+            size="Incident Count",
+            zoom=2,
+            height=600
         )
+        fig.update_layout(mapbox_style="open-street-map", margin={"r":0,"t":0,"l":0,"b":0})
+        # Location ids let clicks and the browser-side selection identify markers
+        fig.update_traces(customdata=map_df["id"].tolist())
+        return map_df, fig, None
+
+    return map_cache.get_or_compute((data["version"], filter_cache_key(filter_spec)), build)
+
+
+# Marker colours and mapbox centre/zoom for the selected location id
+def map_selection(map_df, fig, selected_location):
+    ids = map_df["id"].to_numpy()
+    colors = np.where(ids == selected_location, "red", "blue").tolist()
+    selected_positions = np.flatnonzero(ids == selected_location) if selected_location else []
+    if len(selected_positions):
+        selected_row = map_df.iloc[selected_positions[0]]
+        return colors, {"lat": float(selected_row["lat"]), "lon": float(selected_row["lon"])}, 10
+    return colors, fig.layout.mapbox.center.to_plotly_json(), fig.layout.mapbox.zoom
+
+
+# Marker trace for the clusters and single locations inside the current viewport.
+# customdata carries the location id of single points and "" for clusters, which are not selectable.
+def clustered_trace(map_df, index, bounds, zoom, selected_location):
+    ids = map_df["id"].to_numpy()
+    selected_positions = np.flatnonzero(ids == selected_location) if selected_location else []
+    clusters = index.clusters(bounds, zoom, selected=selected_positions[0] if len(selected_positions) else None)
+    single = clusters["position"].to_numpy() >= 0
+    positions = np.maximum(clusters["position"].to_numpy(), 0)
+    names = np.where(single, map_df["Location"].to_numpy()[positions], "")
+    counts = clusters["weight"].astype(int).to_numpy()
+    points = clusters["points"].to_numpy()
+    hovertext = np.where(single, names, [f"{p} locations, {c} incidents" for p, c in zip(points, counts)])
+    return {
+        "lat": clusters["lat"].round(5).tolist(),
+        "lon": clusters["lon"].round(5).tolist(),
+        "hovertext": hovertext.tolist(),
+        "customdata": np.where(single, ids[positions], "").tolist(),
+        "marker": {
+            "size": (8 + 4 * np.sqrt(counts)).round(1).tolist(),
+            "color": np.where(clusters["selected"], "red", np.where(single, "blue", "purple")).tolist(),
+        },
+    }
 
-    return dcc.Graph(id="map-graph", figure=fig, style={"width": "100%", "height": "100%"})
 
-# Click interaction (map ↔ card)
+# Map rendering callback: the Graph stays mounted and the browser recolours and recentres
+# it on selection (assets/selection.js). Results with more than CLUSTER_MIN_POINTS
+# locations are clustered server-side for the current viewport, which is re-queried on
+# pan/zoom and when the browser moves the map to a selection (map-viewport).
 @app.callback(
+    Output("map-graph", "figure"),
+    Output("map-graph", "style"),
+    Output("map-message", "children"),
+    Output("rendered-map", "data"),
+    Input("filter-spec", "data"),
+    Input("map-graph", "relayoutData"),
+    Input("map-viewport", "data"),
+    State("selected-location", "data"),
+    State("rendered-map", "data")
+)
+@instrument
+def render_map(filter_spec, relayout, viewport_request, selected_location, rendered):
+    data = dataset
+    _, filtered_grouped_df = get_filtered_frames(data, filter_spec)
+    record_rows("render_map", len(filtered_grouped_df))
+    hidden = {"display": "none"}
+    if filtered_grouped_df.empty:
+        return {}, hidden, html.Div("No data matches the filter criteria.", style={"color": "red", "textAlign": "center"}), None
+
+    map_df, base_fig, index = get_base_map(data, filter_spec)
+    if base_fig is None:
+        return {}, hidden, html.Div("No valid lat/lon data for map.", style={"color": "red", "textAlign": "center"}), None
+
+    state = {"version": data["version"], "filter": filter_spec, "clustered": index is not None}
+    moved = ctx.triggered_id in ("map-graph", "map-viewport")
+    if index is None:
+        if moved:
+            return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+        colors, center, zoom = map_selection(map_df, base_fig, selected_location)
+        fig = go.Figure(base_fig)
+        fig.update_traces(marker=dict(color=colors))
+        fig.update_layout(mapbox_center=center, mapbox_zoom=zoom)
+        return fig, {"width": "100%", "height": "100%"}, None, state
+
+    # Clustered map: pans/zooms and selections re-query the viewport
+    if ctx.triggered_id == "map-graph":
+        viewport = viewport_from_relayout(relayout)
+    elif ctx.triggered_id == "map-viewport" and viewport_request:
+        center, zoom = viewport_request["center"], viewport_request["zoom"]
+        viewport = center, zoom, viewport_bounds(center, zoom)
+    else:
+        viewport = None
+    if viewport is not None and rendered == state:
+        center, zoom, bounds = viewport
+        fig = Patch()
+        for key, value in clustered_trace(map_df, index, bounds, zoom, selected_location).items():
+            fig["data"][0][key] = value
+        return fig, dash.no_update, dash.no_update, state
+    if moved:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+    _, center, zoom = map_selection(map_df, base_fig, selected_location)
+    fig = go.Figure(base_fig)
+    fig.update_traces(**clustered_trace(map_df, index, viewport_bounds(center, zoom), zoom, selected_location))
+    # Keep the user's pan/zoom across viewport updates until a selection recentres the map
+    fig.update_layout(mapbox_center=center, mapbox_zoom=zoom, uirevision=selected_location or "")
+    return fig, {"width": "100%", "height": "100%"}, None, state
+
+# Click interaction (map <-> card), handled in the browser: a click only sets the selected
+# location id and its coordinates, which then highlight and scroll to its card and
+# recolour/recentre the map. The server is only involved when the card is outside the
+# rendered window (card-target) or a clustered map needs its new viewport (map-viewport).
+app.clientside_callback(
+    ClientsideFunction(namespace="selection", function_name="select"),
     Output("selected-location", "data"),
+    Output("map-focus", "data"),
     Output("debug-output", "children"),
     Input("map-graph", "clickData"),
     Input({"type": "card", "index": dash.ALL}, "n_clicks"),
-    State({"type": "card", "index": dash.ALL}, "id"),
     prevent_initial_call=True
 )
-def sync_selection(map_click, card_clicks, card_ids):
-    triggered = ctx.triggered_id
-    if triggered == "map-graph" and map_click:
-        selected = map_click["points"][0]["hovertext"]
-        selected = selected.strip()
-        selected = re.sub(r'[^a-zA-Z0-9\s]', '', selected)
-        selected = re.sub(r'\s+', ' ', selected)
-        print(f"Map click: Selected location = '{selected}'")
-        return selected, f"Selected location (map): {selected}"
-    elif isinstance(triggered, dict) and "index" in triggered:
-        clicked_id = card_ids[card_ids.index(triggered)]
-        selected = clicked_id.replace("card-", "")
-        selected = selected.strip()
-        selected = re.sub(r'[^a-zA-Z0-9\s]', '', selected)
-        selected = re.sub(r'\s+', ' ', selected)
-        print(f"Card click: Selected location = '{selected}'")
-        return selected, f"Selected location (card): {selected}"
-    return dash.no_update, dash.no_update
+
+app.clientside_callback(
+    ClientsideFunction(namespace="selection", function_name="show_card"),
+    Output("card-target", "data"),
+    Input("selected-location", "data"),
+    Input("rendered-cards", "data"),
+    prevent_initial_call=True
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="selection", function_name="show_map"),
+    Output("map-graph", "figure", allow_duplicate=True),
+    Output("map-viewport", "data"),
+    Input("selected-location", "data"),
+    State("map-focus", "data"),
+    State("map-graph", "figure"),
+    State("rendered-map", "data"),
+    prevent_initial_call=True
+)
 
 # For Render.com deployment
 server = app.server
+install_metrics(server)
+install_api(server, lambda: dataset, get_filtered_frames, make_filter_spec)
+
+# Each server process watches the workbook from its first request on: threads started at
+# import would not survive gunicorn forking the preloaded app into workers. A reload loads
+# the new dataset in every worker separately, so from the first reload on each worker holds
+# its own private copy and the copy-on-write sharing of a preloaded dataset is gone until
+# the workers are restarted.
+watcher_pid = None
+watcher_lock = threading.Lock()
+
+
+@server.before_request
+def start_dataset_watcher():
+    global watcher_pid
+    if DATASET_RELOAD_SECONDS <= 0 or watcher_pid == os.getpid():
+        return
+    with watcher_lock:
+        if watcher_pid != os.getpid():
+            watcher_pid = os.getpid()
+            DatasetWatcher(use_dataset, dataset, interval=DATASET_RELOAD_SECONDS).start()
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8050))
@@ -0,0 +1,19 @@
+// Load the next page of cards when the card list is scrolled near its end
+(function () {
+    var lastLoad = 0;
+    document.addEventListener("scroll", function (event) {
+        var list = event.target;
+        if (!list || list.id !== "left-section") {
+            return;
+        }
+        if (list.scrollTop + list.clientHeight < list.scrollHeight - 200) {
+            return;
+        }
+        var button = document.getElementById("load-more-cards");
+        var now = Date.now();
+        if (button && button.style.display !== "none" && now - lastLoad > 500) {
+            lastLoad = now;
+            button.click();
+        }
+    }, true);
+})();
@@ -0,0 +1,102 @@
+// Selection handling for map and card clicks, run as Dash clientside callbacks (see app.py)
+(function () {
+    var dc = window.dash_clientside = window.dash_clientside || {};
+
+    // DOM id Dash gives a card with the pattern id {"type": "card", "index": id}
+    function cardElement(id) {
+        return document.getElementById('{"index":' + JSON.stringify(id) + ',"type":"card"}');
+    }
+
+    function scrollToCard(id) {
+        var card = cardElement(id);
+        var list = document.getElementById("left-section");
+        if (card && list) {
+            list.scrollTop = card.offsetTop - list.offsetTop - 10;
+        }
+    }
+
+    // Location coordinates from a card's data-lat/data-lon attributes
+    function cardFocus(id) {
+        var card = cardElement(id);
+        var lat = card ? parseFloat(card.getAttribute("data-lat")) : NaN;
+        var lon = card ? parseFloat(card.getAttribute("data-lon")) : NaN;
+        return isNaN(lat) || isNaN(lon) ? null : {lat: lat, lon: lon};
+    }
+
+    // Selected card that is waiting for the server to render it
+    var pendingCard = null;
+
+    dc.selection = {
+        // Map marker or card click -> selected location id and its coordinates
+        select: function (mapClick, cardClicks) {
+            var context = dc.callback_context;
+            var triggered = context.triggered_id;
+            if (triggered === "map-graph" && mapClick) {
+                var point = mapClick.points[0];
+                // Clustered markers carry an empty customdata and do not select anything
+                if (!point.customdata) {
+                    return [dc.no_update, dc.no_update, dc.no_update];
+                }
+                return [point.customdata, {lat: point.lat, lon: point.lon}, "Selected location (map): " + point.customdata];
+            }
+            // Cards added to the list also trigger this, with n_clicks still 0
+            if (triggered && triggered.type === "card" && context.triggered[0].value) {
+                var id = triggered.index;
+                return [id, cardFocus(id), "Selected location (card): " + id];
+            }
+            return [dc.no_update, dc.no_update, dc.no_update];
+        },
+
+        // Highlight the selected card and scroll to it. A card outside the rendered window
+        // is requested from the server through card-target and scrolled to once rendered.
+        show_card: function (selected, rendered) {
+            if (dc.callback_context.triggered_id === "rendered-cards") {
+                if (pendingCard && cardElement(pendingCard)) {
+                    var id = pendingCard;
+                    pendingCard = null;
+                    setTimeout(function () { scrollToCard(id); }, 0);
+                }
+                return dc.no_update;
+            }
+
+            document.querySelectorAll("#card-list .card.selected").forEach(function (card) {
+                var cardId = JSON.parse(card.id);
+                if (cardId.index !== selected) {
+                    dc.set_props(cardId, {className: "card"});
+                }
+            });
+            if (!selected) {
+                return dc.no_update;
+            }
+            if (!cardElement(selected)) {
+                pendingCard = selected;
+                return {id: selected, requested: Date.now()};
+            }
+            dc.set_props({type: "card", index: selected}, {className: "card selected"});
+            scrollToCard(selected);
+            return dc.no_update;
+        },
+
+        // Recolour the markers and recentre the map on the selection. A clustered map also
+        // hands the new viewport to the server (map-viewport) to re-cluster it.
+        show_map: function (selected, focus, figure, rendered) {
+            if (!rendered || !figure || !figure.data || !figure.data.length) {
+                return [dc.no_update, dc.no_update];
+            }
+            var ids = figure.data[0].customdata || [];
+            var patch = new dc.Patch();
+            patch.assign(["data", 0, "marker", "color"], ids.map(function (id) {
+                return id === selected ? "red" : (id ? "blue" : "purple");
+            }));
+            if (!focus) {
+                return [patch.build(), dc.no_update];
+            }
+            var center = {lat: focus.lat, lon: focus.lon};
+            // A new uirevision makes plotly apply the centre even if the map was panned
+            patch.assign(["layout", "mapbox", "center"], center)
+                .assign(["layout", "mapbox", "zoom"], 10)
+                .assign(["layout", "uirevision"], selected + "@" + Date.now());
+            return [patch.build(), rendered.clustered ? {center: center, zoom: 10} : dc.no_update];
+        }
+    };
+})();
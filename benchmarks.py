@@ -0,0 +1,691 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import requests
+from plotly.utils import PlotlyJSONEncoder
+
+import ingest
+from ingest import (
+    SHEET_NAME, SOURCE_FILE, DatasetWatcher, build_frames, group_view, load_dataset, normalize_location, parse_coordinates,
+    read_source,
+)
+from count_cube import CountCube
+from search_index import FilterIndex, scan_rows
+from spatial import SpatialIndex, viewport_bounds
+from utils import parse_preview
+
+
+# Synthetic raw workbook of `n` incidents with the real sheet's columns.
+# Every other column is resampled from real rows; incidents are spread over about n/4
+# sites, each with its own Location and coordinates, so grouped locations hold several
+# incidents and some sites have missing or malformed coordinates like the real data.
+def make_synthetic_raw(n, seed=0, source=None):
+    rng = np.random.default_rng(seed)
+    source = read_source() if source is None else source
+    raw = source.sample(n=n, replace=True, random_state=seed).reset_index(drop=True)
+
+    n_sites = max(n // 4, 1)
+    site = rng.integers(0, n_sites, size=n)
+    base = source["Location"].fillna("Unknown").astype(str).to_numpy()[rng.integers(0, len(source), size=n_sites)]
+    raw["Location"] = pd.Series(base[site], dtype=object) + " Site " + pd.Series(site).astype(str)
+
+    site_coords = np.array([f"{a},{b}" for a, b in zip(rng.uniform(-60, 70, n_sites).round(4), rng.uniform(-180, 180, n_sites).round(4))], dtype=object)
+    site_coords[rng.random(n_sites) < 0.05] = np.nan
+    site_coords[rng.random(n_sites) < 0.01] = "unknown"
+    site_coords[rng.random(n_sites) < 0.01] = "95.0,200.0"
+    raw["Custom location (Lat, Lon)"] = site_coords[site]
+    return raw
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+# Filter latency of the str.contains scan vs the prebuilt index
+def bench_filter(df, numerical_cols, string_cols, repeat):
+    index = FilterIndex(df, string_cols, numerical_cols)
+    queries = [("Country", "korea"), ("Description", "fire"), ("Integrator", "lg"), ("Location", "site 12")]
+    results = []
+    for column, value in queries:
+        scan = best_of(lambda: df.iloc[scan_rows(df, column, value)], repeat)
+        indexed = best_of(lambda: df.iloc[index.lookup(column, value)], repeat)
+        results.append((f"filter {column}~{value!r}", scan, indexed))
+    for column in numerical_cols[:1]:
+        scan = best_of(lambda: df.iloc[scan_rows(df, column, 2.0, numerical=True)], repeat)
+        indexed = best_of(lambda: df.iloc[index.lookup(column, 2.0)], repeat)
+        results.append((f"filter {column}==2.0", scan, indexed))
+    return results
+
+
+# The per-cell coordinate parser ingestion used to apply twice per row
+def legacy_extract_lat_lon(coord, part):
+    try:
+        if coord == "-" or not isinstance(coord, str) or "," not in coord:
+            return None
+        parts = coord.split(",")
+        value = float(parts[0].strip()) if part == "lat" else float(parts[1].strip())
+        if part == "lat" and not (-90 <= value <= 90):
+            return None
+        if part == "lon" and not (-180 <= value <= 180):
+            return None
+        return value
+    except (ValueError, IndexError):
+        return None
+
+
+def legacy_parse_coordinates(series):
+    return (series.apply(lambda x: legacy_extract_lat_lon(x, "lat")).to_numpy(dtype="float64"),
+            series.apply(lambda x: legacy_extract_lat_lon(x, "lon")).to_numpy(dtype="float64"))
+
+
+# Coordinate parsing: per-cell apply vs the vectorized parser (tests/test_ingest.py checks
+# its results). Also timed with every row at its own site, where no string is shared.
+def bench_coordinates(raw, repeat):
+    rng = np.random.default_rng(0)
+    distinct = pd.Series([f"{a},{b}" for a, b in zip(rng.uniform(-90, 90, len(raw)), rng.uniform(-180, 180, len(raw)))], dtype="str")
+    results = []
+    for name, series in (("coordinates", raw["Custom location (Lat, Lon)"].fillna("-")), ("coordinates, all distinct", distinct)):
+        before = best_of(lambda: legacy_parse_coordinates(series), repeat)
+        after = best_of(lambda: parse_coordinates(series), repeat)
+        results.append((f"{name} {len(series)} rows", before, after))
+    return results
+
+
+# The per-filter list aggregation filter_dataframe used to run
+def legacy_group_by_location(df):
+    agg_dict = {col: "first" if col in ["lat", "lon", "Country"] else list for col in df.columns if col not in ["Location"]}
+    grouped_df = df.groupby("Location").agg(agg_dict).reset_index()
+    grouped_df["Incident Count"] = df.groupby("Location").size().values
+    grouped_df["id"] = normalize_location(grouped_df["Location"])
+    return grouped_df
+
+
+# Per-filter grouping: list aggregation vs a view over the precomputed location codes
+def bench_grouping(df, groups, repeat):
+    rows = scan_rows(df, "Description", "fire")
+    # The list aggregation predates the categorical columns, whose groupby can't build lists
+    plain = df.astype({col: "str" for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+    before = best_of(lambda: legacy_group_by_location(plain.iloc[rows]), repeat)
+    after = best_of(lambda: group_view(df, groups, rows), repeat)
+    return [(f"group {len(rows)} filtered rows", before, after)]
+
+
+# Bar plot counts: groupby over the filtered frame vs a bincount over the filter's rows
+def bench_counts(df, repeat):
+    cube = CountCube(df, ["Country", "Cause", "Integrator", "Enclosure Type"])
+    rows = scan_rows(df, "Description", "fire")
+    filtered = df.iloc[rows]
+    results = []
+    for column in ("Country", "Integrator"):
+        before = best_of(lambda: filtered.groupby(column, observed=True).size().reset_index(name="Count"), repeat)
+        after = best_of(lambda: cube.counts(column, rows), repeat)
+        results.append((f"counts by {column}, {len(rows)} rows", before, after))
+    return results
+
+
+# Map payload: one marker per location vs viewport clusters from the spatial index
+def bench_map(grouped_df, repeat):
+    map_df = grouped_df[grouped_df["lat"].notnull() & grouped_df["lon"].notnull()]
+    results = []
+
+    def full_figure():
+        fig = px.scatter_mapbox(map_df, lat="lat", lon="lon", hover_name="Location", size="Incident Count", zoom=2, height=600)
+        return json.dumps(fig, cls=PlotlyJSONEncoder)
+
+    before = best_of(full_figure, repeat)
+    before_bytes = len(full_figure())
+    index = SpatialIndex(map_df["lat"], map_df["lon"], map_df["Incident Count"])
+    for zoom in (2, 6):
+        bounds = viewport_bounds({"lat": 36.0, "lon": -100.0}, zoom)
+
+        def clustered():
+            clusters = index.clusters(bounds, zoom)
+            return json.dumps({col: clusters[col].tolist() for col in ("lat", "lon", "points", "weight")})
+
+        after = best_of(clustered, repeat)
+        results.append((f"map {len(map_df)} sites, zoom {zoom}", before, after, before_bytes, len(clustered())))
+    return results
+
+
+# In-memory stand-in for a streamed requests.Response
+class FixtureResponse:
+    def __init__(self, body, content_type="text/html; charset=utf-8"):
+        self.body = body
+        self.headers = {"Content-Type": content_type}
+        self.text = body.decode("utf-8", errors="replace")
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+# News-style page: a head with og tags and inline script, then `body_kb` of article markup
+def fixture_page(body_kb):
+    head = ("<html><head><meta charset='utf-8'><title>Battery storage fire</title>"
+            "<meta property='og:title' content='Fire at BESS site'>"
+            "<meta property='og:description' content='Crews contained a fire at a battery storage facility.'>"
+            "<meta property='og:image' content='https://example.com/fire.jpg'>"
+            "<script>" + "var x = 1;" * 2000 + "</script></head>")
+    paragraph = "<p>" + "Lithium-ion modules overheated and ignited. " * 20 + "</p>"
+    body = "<body>" + paragraph * (body_kb * 1024 // len(paragraph)) + "</body></html>"
+    return (head + body).encode("utf-8")
+
+
+# The full-document BeautifulSoup parse get_url_preview used before streaming
+def legacy_parse_preview(url, response):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(response.text, "html.parser")
+    preview = {
+        "title": soup.find("meta", property="og:title") or soup.find("title"),
+        "description": soup.find("meta", property="og:description"),
+        "image": soup.find("meta", property="og:image"),
+        "url": url
+    }
+    preview["title"] = preview["title"].get("content", preview["title"].text)[:100] if preview["title"] else ""
+    preview["description"] = preview["description"].get("content", "")[:200] if preview["description"] else ""
+    preview["image"] = preview["image"].get("content", "") if preview["image"] else ""
+    return preview
+
+
+def bench_previews(repeat):
+    results = []
+    for body_kb in (50, 500, 2000):
+        response = FixtureResponse(fixture_page(body_kb))
+        before = best_of(lambda: legacy_parse_preview("https://example.com", response), repeat)
+        after = best_of(lambda: parse_preview("https://example.com", response), repeat)
+        results.append((f"preview parse {body_kb} KB page", before, after))
+    return results
+
+
+# Posts Dash callback requests to the app's Flask server (or to a running app at `url`), as the browser would
+class DashClient:
+    def __init__(self, server=None, url=None):
+        self.client = server.test_client() if url is None else UrlClient(url)
+
+    def layout(self):
+        return self.client.get("/_dash-layout")
+
+    # GET a JSON API page accepting gzip, optionally revalidating an earlier response's ETag
+    def api(self, path, etag=None):
+        headers = {"Accept-Encoding": "gzip"}
+        if etag:
+            headers["If-None-Match"] = etag
+        response = self.client.get(path, headers=headers)
+        # Read the streamed body, so that serializing it is part of the request's time
+        response.data if hasattr(response, "data") else response.content
+        return response
+
+    # outputs: [(id, property)]; inputs/state: [(id, property, value)] or raw request entries
+    def call(self, outputs, inputs, state=(), changed=()):
+        outputs = [{"id": id_, "property": prop} for id_, prop in outputs]
+        entry = lambda item: item if isinstance(item, list) else {"id": item[0], "property": item[1], "value": item[2]}
+        payload = {
+            "output": f"{outputs[0]['id']}.{outputs[0]['property']}" if len(outputs) == 1
+            else ".." + "...".join(f"{o['id']}.{o['property']}" for o in outputs) + "..",
+            "outputs": outputs[0] if len(outputs) == 1 else outputs,
+            "inputs": [entry(item) for item in inputs],
+            "state": [entry(item) for item in state],
+            "changedPropIds": list(changed),
+        }
+        response = self.client.post("/_dash-update-component", json=payload)
+        if response.status_code not in (200, 204):
+            raise RuntimeError(f"callback {payload['output']} failed: {response.status_code} {response.data[:300]!r}")
+        return response
+
+
+class UrlClient:
+    def __init__(self, url):
+        self.url = url
+        self.session = requests.Session()
+
+    def get(self, path, headers=None):
+        return self.session.get(self.url + path, headers=headers)
+
+    def post(self, path, json):
+        return self.session.post(self.url + path, json=json)
+
+
+# One measurement: cold (caches cleared) and warm latency, traced peak memory and response size
+def measure(fn, repeat, reset):
+    reset()
+    start = time.perf_counter()
+    result = fn()
+    cold = time.perf_counter() - start
+    warm = sorted(best_of(fn, 1) for _ in range(repeat)) or [cold]
+    reset()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    size = len(result.data) if hasattr(result, "data") else None
+    return result, {
+        "cold_ms": round(cold * 1000, 3),
+        "warm_ms": round(warm[len(warm) // 2] * 1000, 3),
+        "peak_mb": round(peak / 2 ** 20, 3),
+        "bytes": size,
+    }
+
+
+# Time ingestion, the layout and every Dash callback against `n` synthetic incidents
+def bench_callbacks(app_module, client, n, source, repeat):
+    raw = make_synthetic_raw(n, source=source)
+    results = []
+
+    def ingest():
+        frames = build_frames(raw)
+        app_module.use_dataset(dict(frames, version=f"synthetic-{n}"))
+
+    def clear_caches():
+        for cache in (app_module.result_cache, app_module.card_cache, app_module.figure_cache, app_module.map_cache):
+            cache.clear()
+
+    def record(stage, fn, reset=clear_caches, times=repeat):
+        result, stats = measure(fn, times, reset)
+        results.append(dict(stats, rows=n, stage=stage))
+        return result
+
+    record("ingest", ingest, reset=lambda: None, times=0)
+    record("layout", client.layout)
+
+    spec_response = record("filter_dataframe", lambda: client.call(
+        [("filter-spec", "data"), ("debug-log", "children")],
+        [("apply-filter", "n_clicks", 1), ("reset-filter", "n_clicks", 0)],
+        [("filter-column", "value", "Country"), ("filter-value", "value", "korea")],
+        ["apply-filter.n_clicks"],
+    ))
+    spec = spec_response.json["response"]["filter-spec"]["data"]
+
+    for plot_column in ("Country", "Integrator", "Cause"):
+        record(f"update_bar_plot[{plot_column}]", lambda: client.call(
+            [("bar-plot", "figure")],
+            [("filter-spec", "data", spec), ("plot-column", "value", plot_column)],
+            changed=["plot-column.value"],
+        ))
+
+    # Selection itself is handled in the browser; the server only renders a selected card
+    # beyond the card window (card-target) and re-clusters a recentred map (map-viewport)
+    card_outputs = [("card-list", "children"), ("load-more-cards", "style"), ("rendered-cards", "data")]
+    cards = record("render_cards", lambda: client.call(
+        card_outputs,
+        [("filter-spec", "data", spec), ("card-limit", "data", app_module.CARD_PAGE_SIZE), ("card-target", "data", None)],
+        [("selected-location", "data", None), ("rendered-cards", "data", None)],
+        ["filter-spec.data"],
+    ))
+    rendered_cards = cards.json["response"]["rendered-cards"]["data"]
+    _, filtered_grouped_df = app_module.get_filtered_frames(app_module.dataset, spec)
+    selected_row = filtered_grouped_df.iloc[min(2 * app_module.CARD_PAGE_SIZE, len(filtered_grouped_df) - 1)]
+    selected = selected_row["id"]
+    record("render_cards[target]", lambda: client.call(
+        card_outputs,
+        [("filter-spec", "data", spec), ("card-limit", "data", app_module.CARD_PAGE_SIZE), ("card-target", "data", {"id": selected})],
+        [("selected-location", "data", selected), ("rendered-cards", "data", rendered_cards)],
+        ["card-target.data"],
+    ))
+
+    map_outputs = [("map-graph", "figure"), ("map-graph", "style"), ("map-message", "children"), ("rendered-map", "data")]
+    rendered_map = record("render_map", lambda: client.call(
+        map_outputs,
+        [("filter-spec", "data", spec), ("map-graph", "relayoutData", None), ("map-viewport", "data", None)],
+        [("selected-location", "data", None), ("rendered-map", "data", None)],
+        ["filter-spec.data"],
+    )).json["response"]["rendered-map"]["data"]
+    if rendered_map and rendered_map["clustered"]:
+        viewport = {"center": {"lat": float(selected_row["lat"]), "lon": float(selected_row["lon"])}, "zoom": 10}
+        record("render_map[viewport]", lambda: client.call(
+            map_outputs,
+            [("filter-spec", "data", spec), ("map-graph", "relayoutData", None), ("map-viewport", "data", viewport)],
+            [("selected-location", "data", selected), ("rendered-map", "data", rendered_map)],
+            ["map-viewport.data"],
+        ))
+
+    # The JSON API: one filtered page of each resource, then a revalidation of the first
+    query = f"column={spec['column']}&value={spec['value']}&limit=1000"
+    incidents = record("api_incidents", lambda: client.api(f"/api/incidents?{query}"))
+    record("api_locations", lambda: client.api(f"/api/locations?{query}"))
+    record("api_incidents[revalidate]", lambda: client.api(f"/api/incidents?{query}", incidents.headers["ETag"]))
+    return results
+
+
+def print_results(results, baseline=None, threshold=0.2):
+    previous = {(r["rows"], r["stage"]): r for r in (baseline or {}).get("results", [])}
+    for r in results:
+        line = (f"  {r['rows']:>8} {r['stage']:<28} cold {r['cold_ms']:10.2f} ms  warm {r['warm_ms']:10.2f} ms"
+                f"  peak {r['peak_mb']:9.2f} MB")
+        if r["bytes"] is not None:
+            line += f"  {r['bytes'] / 1024:10.1f} KB"
+        old = previous.get((r["rows"], r["stage"]))
+        if old and old["warm_ms"]:
+            change = r["warm_ms"] / old["warm_ms"] - 1
+            line += f"  {change:+7.1%}" + ("  REGRESSION" if change > threshold else "")
+        print(line)
+
+
+# Workbook of `n` synthetic incidents for out-of-process runs, written once under .cache/
+def synthetic_workbook(n, source, seed=0):
+    path = os.path.join(".cache", f"synthetic-{n}-{seed}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(".cache", exist_ok=True)
+        make_synthetic_raw(n, seed=seed, source=source).to_excel(path, sheet_name=SHEET_NAME, index=False)
+    return path
+
+
+# Resident (RSS), private (USS) and proportional (PSS) memory of a process, in bytes
+def process_memory(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[key] = int(value.split()[0]) * 1024
+    return {"rss": fields["Rss"], "uss": fields["Private_Clean"] + fields["Private_Dirty"], "pss": fields["Pss"]}
+
+
+def child_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# A browser session's worth of callbacks: layout, filter, bar chart, cards and map.
+# The latency of each request is appended to `timings` when given.
+def browse(client, timings=None):
+    def timed(request, *args, **kwargs):
+        start = time.perf_counter()
+        request(*args, **kwargs)
+        if timings is not None:
+            timings.append(time.perf_counter() - start)
+
+    timed(client.layout)
+    timed(
+        client.call,
+        [("filter-spec", "data"), ("debug-log", "children")],
+        [("apply-filter", "n_clicks", 1), ("reset-filter", "n_clicks", 0)],
+        [("filter-column", "value", "Country"), ("filter-value", "value", "korea")],
+        ["apply-filter.n_clicks"],
+    )
+    for filter_spec in (None, {"column": "Country", "value": "korea"}):
+        timed(client.call, [("bar-plot", "figure")], [("filter-spec", "data", filter_spec), ("plot-column", "value", "Country")], changed=["filter-spec.data"])
+        timed(
+            client.call,
+            [("card-list", "children"), ("load-more-cards", "style"), ("rendered-cards", "data")],
+            [("filter-spec", "data", filter_spec), ("card-limit", "data", 25), ("card-target", "data", None)],
+            [("selected-location", "data", None), ("rendered-cards", "data", None)],
+            ["filter-spec.data"],
+        )
+        timed(
+            client.call,
+            [("map-graph", "figure"), ("map-graph", "style"), ("map-message", "children"), ("rendered-map", "data")],
+            [("filter-spec", "data", filter_spec), ("map-graph", "relayoutData", None), ("map-viewport", "data", None)],
+            [("selected-location", "data", None), ("rendered-map", "data", None)],
+            ["filter-spec.data"],
+        )
+
+
+# Memory of `gunicorn app:server` per worker count, with the app loaded in each worker
+# (GUNICORN_PRELOAD=0) and loaded once in the master and shared by fork (the default).
+# Every worker serves some browsing sessions before it is measured.
+def bench_workers(counts, n, source, sessions_per_worker=5):
+    env = dict(os.environ, LOG_LEVEL="OFF")
+    if n:
+        path = synthetic_workbook(n, source)
+        snapshot = os.path.join(".cache", f"synthetic-{n}.snapshot.pkl")
+        load_dataset(path, snapshot)
+        env.update(INCIDENTS_FILE=path, INCIDENTS_SNAPSHOT=snapshot)
+
+    results = []
+    for preload in (False, True):
+        for workers in counts:
+            url = f"http://127.0.0.1:{free_port()}"
+            command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-w", str(workers), "-b", url[len("http://"):], "app:server"]
+            process = subprocess.Popen(command, env=dict(env, GUNICORN_PRELOAD=str(int(preload))),
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                start = time.perf_counter()
+                while True:
+                    if process.poll() is not None:
+                        raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+                    try:
+                        if requests.get(url + "/_dash-layout", timeout=30).ok and len(child_pids(process.pid)) == workers:
+                            break
+                    except requests.RequestException:
+                        pass
+                    time.sleep(0.2)
+                ready = time.perf_counter() - start
+                with ThreadPoolExecutor(max_workers=2 * workers) as pool:
+                    list(pool.map(lambda _: browse(DashClient(url=url)), range(workers * sessions_per_worker)))
+                worker_memory = [process_memory(pid) for pid in child_pids(process.pid)]
+                master = process_memory(process.pid)
+            finally:
+                process.terminate()
+                process.wait()
+            results.append({
+                "rows": n,
+                "layout": "preload" if preload else "per-worker",
+                "workers": workers,
+                "ready_s": round(ready, 2),
+                "master_rss_mb": round(master["rss"] / 2**20, 1),
+                "worker_rss_mb": round(np.mean([m["rss"] for m in worker_memory]) / 2**20, 1),
+                "worker_uss_mb": round(np.mean([m["uss"] for m in worker_memory]) / 2**20, 1),
+                "total_pss_mb": round((master["pss"] + sum(m["pss"] for m in worker_memory)) / 2**20, 1),
+            })
+            r = results[-1]
+            print(f"  {r['layout']:<10} {workers:>2} workers  ready {r['ready_s']:6.2f} s  master RSS {r['master_rss_mb']:7.1f} MB"
+                  f"  per worker RSS {r['worker_rss_mb']:7.1f} MB, private {r['worker_uss_mb']:7.1f} MB  total PSS {r['total_pss_mb']:8.1f} MB")
+    return results
+
+
+def latency_stats(timings):
+    timings = np.array(timings) * 1000
+    return {"requests": len(timings), "p50_ms": round(float(np.percentile(timings, 50)), 2),
+            "p95_ms": round(float(np.percentile(timings, 95)), 2), "max_ms": round(float(timings.max()), 2)}
+
+
+# Hot reload: the dataset watcher picks up a replaced workbook of `n` incidents while
+# browsing sessions keep running, `think` seconds apart. Reports reload time and request
+# latency during the reload against the same sessions with no reload running.
+def bench_reload(app_module, n, source, repeat, think=1.0):
+    workbooks = [synthetic_workbook(n, source, seed) for seed in (0, 1)]
+    client = DashClient(app_module.server)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "incidents.xlsx")
+        snapshot = os.path.join(directory, "incidents.snapshot.pkl")
+        shutil.copy(workbooks[0], path)
+        app_module.use_dataset(load_dataset(path, snapshot))
+        watcher = DatasetWatcher(app_module.use_dataset, app_module.dataset, path, snapshot)
+        watcher.check()
+
+        # One untimed session warms the caches, as they are when a reload starts
+        browse(client)
+        idle = []
+        for _ in range(max(repeat, 10)):
+            browse(client, idle)
+            time.sleep(think)
+        print(f"  idle      {latency_stats(idle)}")
+        results.append(dict(latency_stats(idle), rows=n, stage="idle"))
+
+        for attempt in range(repeat):
+            shutil.copy(workbooks[(attempt + 1) % 2], path)
+            previous = app_module.dataset["version"]
+            reload = {}
+
+            def run_reload():
+                start = time.perf_counter()
+                reload["changed"] = watcher.check()
+                reload["seconds"] = time.perf_counter() - start
+
+            thread = threading.Thread(target=run_reload)
+            during = []
+            thread.start()
+            while thread.is_alive():
+                browse(client, during)
+                time.sleep(think)
+            thread.join()
+            if not reload.get("changed") or app_module.dataset["version"] == previous:
+                raise RuntimeError("the watcher did not swap in the replaced workbook")
+            stats = dict(latency_stats(during), reload_s=round(reload["seconds"], 2))
+            print(f"  reload {attempt + 1}  {stats}")
+            results.append(dict(stats, rows=n, stage=f"reload {attempt + 1}"))
+    return results
+
+
+# Bytes held by a column, counting each distinct Python object once (as the process does;
+# memory_usage(deep=True) counts a string shared by many rows once per row)
+def column_bytes(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.nbytes + column_bytes(pd.Series(series.cat.categories))
+    if series.dtype.kind in "biufcmM":
+        return series.nbytes
+    values = series.to_numpy(dtype=object)
+    return values.nbytes + sum(sys.getsizeof(value) for value in {id(value): value for value in values}.values())
+
+
+# Frame sizes with categorical columns vs plain string columns, built from a workbook like
+# the app does so that strings are shared between rows as they are in production
+def bench_memory(n, source):
+    path = synthetic_workbook(n, source) if n else SOURCE_FILE
+    raw = read_source(path)
+    frames = build_frames(raw)
+    # No column qualifies for a categorical below a negative fraction
+    ingest.CATEGORY_MAX_FRACTION, fraction = -1, ingest.CATEGORY_MAX_FRACTION
+    try:
+        plain = build_frames(raw)["df"]
+    finally:
+        ingest.CATEGORY_MAX_FRACTION = fraction
+    df = frames["df"]
+    results = []
+    for col in df.columns:
+        results.append({"rows": len(df), "frame": "df", "column": col, "dtype": str(df[col].dtype),
+                        "before": column_bytes(plain[col]), "after": column_bytes(df[col])})
+    grouped = sum(column_bytes(frames["grouped_df"][col]) for col in frames["grouped_df"].columns)
+    results.append({"rows": len(df), "frame": "grouped_df", "column": None, "dtype": None, "before": grouped, "after": grouped})
+    return results
+
+
+def run_micro(sizes, repeat, source):
+    print("link previews")
+    for name, before, after in bench_previews(repeat):
+        print(f"  {name:<40} before {before * 1000:9.2f} ms  after {after * 1000:9.2f} ms")
+
+    for n in sizes:
+        raw = make_synthetic_raw(n, source=source)
+        frames = build_frames(raw)
+        df = frames["df"]
+        print(f"\n{n} rows")
+        results = bench_filter(df, frames["numerical_cols"], frames["string_cols"], repeat)
+        results += bench_grouping(df, frames["groups"], repeat)
+        results += bench_coordinates(raw, repeat)
+        results += bench_counts(df, repeat)
+        for name, before, after in results:
+            print(f"  {name:<40} before {before * 1000:9.2f} ms  after {after * 1000:9.2f} ms")
+        for name, before, after, before_bytes, after_bytes in bench_map(frames["grouped_df"], repeat):
+            print(f"  {name:<40} before {before * 1000:9.2f} ms  after {after * 1000:9.2f} ms"
+                  f"  ({before_bytes / 1024:.0f} KB -> {after_bytes / 1024:.1f} KB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashboard ingestion and callbacks on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare warm latencies against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="warm slowdown reported as a regression")
+    parser.add_argument("--micro", action="store_true", help="run the before/after micro-benchmarks instead")
+    parser.add_argument("--workers", type=int, nargs="+", help="measure gunicorn memory at these worker counts instead")
+    parser.add_argument("--reload", action="store_true", help="measure hot reload of a replaced workbook instead")
+    parser.add_argument("--memory", action="store_true", help="report the dataset's in-memory size per column instead")
+    parser.add_argument("--rows", type=int, default=100_000,
+                        help="synthetic incidents for --workers, --reload and --memory (0 = the real workbook, not --reload)")
+    args = parser.parse_args()
+
+    source = read_source()
+    if args.micro:
+        run_micro(args.sizes, args.repeat, source)
+        return
+    if args.memory:
+        results = bench_memory(args.rows, source)
+        for r in sorted(results[:-1], key=lambda r: -r["before"]):
+            print(f"  {r['column']:<32} {r['dtype']:<10} before {r['before'] / 2**20:8.2f} MB  after {r['after'] / 2**20:8.2f} MB")
+        for frame in ("df", "grouped_df"):
+            before = sum(r["before"] for r in results if r["frame"] == frame)
+            after = sum(r["after"] for r in results if r["frame"] == frame)
+            print(f"{frame:<12} {results[0]['rows']} rows  before {before / 2**20:8.2f} MB  after {after / 2**20:8.2f} MB")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"results": results}, f, indent=2)
+        return
+    if args.workers:
+        print(f"gunicorn memory, {args.rows or 'real'} rows")
+        results = bench_workers(args.workers, args.rows, source)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"results": results}, f, indent=2)
+        return
+
+    # The benchmarks swap datasets in themselves; the app's own workbook watcher would swap them back
+    os.environ["DATASET_RELOAD_SECONDS"] = "0"
+    # Keep per-callback log lines out of the output and their formatting out of the timings
+    os.environ["LOG_LEVEL"] = "OFF"
+    import app as app_module
+
+    if args.reload:
+        print(f"hot reload, {args.rows} rows")
+        results = bench_reload(app_module, args.rows, source, args.repeat)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"results": results}, f, indent=2)
+        return
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    client = DashClient(app_module.server)
+    results = []
+    for n in args.sizes:
+        print(f"{n} rows")
+        size_results = bench_callbacks(app_module, client, n, source, args.repeat)
+        print_results(size_results, baseline, args.threshold)
+        results += size_results
+
+    if args.output:
+        meta = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "repeat": args.repeat,
+        }
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
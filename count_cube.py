@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+
+# Incident counts per value of each plot dimension. Every dimension is factorized once at
+# load, so the counts for any subset of rows are one bincount over that subset's codes.
+class CountCube:
+    def __init__(self, df, columns):
+        self.dimensions = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            # Sorted like groupby keys; missing values get code -1 and are not counted
+            codes, values = pd.factorize(df[col], sort=True)
+            codes = codes.astype(np.min_scalar_type(-len(values) - 1))
+            totals = np.bincount(codes[codes >= 0], minlength=len(values))
+            self.dimensions[col] = (codes, values, totals)
+
+    def __contains__(self, column):
+        return column in self.dimensions
+
+    # Incidents per value over `rows` (positions in df; None = all rows), as the frame
+    # groupby(column).size() would give: values without incidents are left out
+    def counts(self, column, rows=None):
+        codes, values, totals = self.dimensions[column]
+        if rows is None:
+            counts = totals
+        else:
+            codes = codes[rows]
+            counts = np.bincount(codes[codes >= 0], minlength=len(values))
+        present = np.flatnonzero(counts)
+        return pd.DataFrame({column: values.take(present), "Count": counts[present]})
@@ -1,23 +1,152 @@
+import argparse
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
 import pandas as pd
-import json
-from utils import get_url_preview
+import requests
+from requests.adapters import HTTPAdapter
+
+from preview_store import STORE_FILE, PreviewStore
+from utils import UNAVAILABLE_TITLE, USER_AGENT, parse_preview, skipped_preview, unavailable_preview
+
+URL_COLUMNS = ['Source URL 1', 'Source URL 2', 'Source URL 3']
+# Statuses worth retrying after a backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-# Load the Excel file with the specified sheet
-df = pd.read_excel('Failure_DB_List_2_updated.xlsx', sheet_name='Failure_DB_List_2_updated')
 
 # Collect all unique URLs from 'Source URL 1', 'Source URL 2', 'Source URL 3'
-urls = set()
-for col in ['Source URL 1', 'Source URL 2', 'Source URL 3']:
-    if col in df.columns:
-        urls.update(df[col].dropna().unique())
+def collect_urls(df):
+    urls = set()
+    for col in URL_COLUMNS:
+        if col in df.columns:
+            urls.update(df[col].dropna().unique())
+    return urls
+
+
+# New URLs, failed fetches and entries older than the TTL are refetched
+def needs_refresh(preview, ttl, now=None):
+    if preview is None or preview.get('title') == UNAVAILABLE_TITLE:
+        return True
+    return (now or time.time()) - preview.get('fetched_at', 0) > ttl
+
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+
+# Fetches previews concurrently over a pooled session, with a cap on requests in flight per host
+class PreviewFetcher:
+    def __init__(self, workers=16, per_host=2, retries=2, backoff=1.0, timeout=10):
+        self.workers = workers
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = host_of(url)
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    # Fetch one preview, revalidating `previous` with ETag/Last-Modified when it has them
+    def fetch(self, url, previous=None):
+        skipped = skipped_preview(url)
+        if skipped:
+            return dict(skipped, fetched_at=time.time())
+
+        headers = {}
+        if previous and previous.get('title') != UNAVAILABLE_TITLE:
+            if previous.get('etag'):
+                headers['If-None-Match'] = previous['etag']
+            if previous.get('last_modified'):
+                headers['If-Modified-Since'] = previous['last_modified']
+
+        for attempt in range(self.retries + 1):
+            try:
+                # The body is streamed, so hold the host slot until parse_preview has read it
+                with self._host_slot(url):
+                    response = self.session.get(url, timeout=self.timeout, headers=headers, allow_redirects=True, stream=True)
+                    try:
+                        if response.status_code == 304 and headers:
+                            return dict(previous, fetched_at=time.time())
+                        if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                            response.raise_for_status()
+                            preview = parse_preview(url, response)
+                            preview['etag'] = response.headers.get('ETag')
+                            preview['last_modified'] = response.headers.get('Last-Modified')
+                            return dict(preview, fetched_at=time.time())
+                    finally:
+                        response.close()
+                time.sleep(self.backoff * 2 ** attempt)
+            except requests.HTTPError:
+                break
+            except requests.RequestException:
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+            except Exception:
+                break
+        return dict(unavailable_preview(url), fetched_at=time.time())
+
+    # Refresh the stale previews among `urls` in `store`, returning the URLs that were fetched.
+    # URLs wait in per-host queues and a host's next URL is only handed to the pool when one of
+    # its fetches finishes, so no worker sits blocked on a busy host while other hosts wait.
+    # Previews are stored as they complete, so an interrupted run keeps what it fetched.
+    def refresh(self, urls, store, ttl, force=False):
+        now = time.time()
+        previews = store.get_many(urls)
+        stale = [url for url in urls if force or needs_refresh(previews.get(url), ttl, now)]
+        queues = {}
+        for url in stale:
+            queues.setdefault(host_of(url), deque()).append(url)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = {}
+
+            def submit(host):
+                url = queues[host].popleft()
+                in_flight[executor.submit(self.fetch, url, previews.get(url))] = (host, url)
+
+            for host, queue in queues.items():
+                for _ in range(min(self.per_host, len(queue))):
+                    submit(host)
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                fetched = {}
+                for future in done:
+                    host, url = in_flight.pop(future)
+                    fetched[url] = future.result()
+                    if queues[host]:
+                        submit(host)
+                store.put_many(fetched)
+        return stale
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fetch link previews for the incident source URLs')
+    parser.add_argument('--ttl-days', type=float, default=30, help='refetch previews older than this')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--per-host', type=int, default=2, help='concurrent requests per host')
+    parser.add_argument('--force', action='store_true', help='refetch every URL')
+    args = parser.parse_args()
 
-# Fetch previews for each URL
-previews = {}
-for url in urls:
-    previews[url] = get_url_preview(url)
+    # Load the Excel file with the specified sheet
+    df = pd.read_excel('Failure_DB_List_2_updated.xlsx', sheet_name='Failure_DB_List_2_updated')
+    urls = collect_urls(df)
 
-# Save the previews to a JSON file
-with open('url_previews.json', 'w') as f:
-    json.dump(previews, f, indent=4)
+    start = time.perf_counter()
+    fetcher = PreviewFetcher(workers=args.workers, per_host=args.per_host)
+    fetched = fetcher.refresh(urls, PreviewStore(), args.ttl_days * 86400, force=args.force)
 
-print("Previews fetched and saved to url_previews.json")
\ No newline at end of file
+    print(f"Fetched {len(fetched)} of {len(urls)} previews in {time.perf_counter() - start:.1f}s; saved to {STORE_FILE}")
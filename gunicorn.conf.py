@@ -0,0 +1,14 @@
+import gc
+import os
+
+# Import the app, and so load the incident dataset, once in the master and fork the workers
+# from it: the frames, indexes and imported modules are then shared copy-on-write instead
+# of being rebuilt in every worker. GUNICORN_PRELOAD=0 restores per-worker loading.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+
+
+# Move everything loaded so far out of the garbage collector's reach before forking, so
+# collections in the workers don't write to (and so copy) the shared objects' pages
+def pre_fork(server, worker):
+    if preload_app:
+        gc.freeze()
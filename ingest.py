@@ -0,0 +1,360 @@
+import contextlib
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: processes rebuild the snapshot independently
+    fcntl = None
+
+# INCIDENTS_FILE / INCIDENTS_SNAPSHOT point the app at another workbook (e.g. for benchmarks)
+SOURCE_FILE = os.getenv("INCIDENTS_FILE", "Failure_DB_List_2_updated.xlsx")
+SHEET_NAME = "Failure_DB_List_2_updated"
+SNAPSHOT_FILE = os.getenv("INCIDENTS_SNAPSHOT", os.path.join(".cache", "incidents.snapshot.pkl"))
+
+log = logging.getLogger("bess")
+
+# Bump when the cleaning pipeline changes so old snapshots are rebuilt
+SNAPSHOT_FORMAT = 4
+
+# Per-location columns taken from the location's first incident
+FIRST_COLUMNS = ["lat", "lon", "Country"]
+
+# String columns with at most this many distinct values per row are stored as categoricals
+# (Country, Integrator, Application, Cause...): int codes plus one copy of each value
+CATEGORY_MAX_FRACTION = 0.5
+
+# Everything load_dataset returns, and therefore everything a snapshot holds
+DATASET_KEYS = ("df", "groups", "grouped_df", "numerical_cols", "string_cols")
+
+
+# Parse "lat,lon" strings into float arrays, NaN where a value is missing, malformed or out
+# of range. Each coordinate is validated on its own, and text after a second comma is ignored.
+# Incidents at one site share a string, so only the distinct strings are parsed.
+def parse_coordinates(series):
+    codes, uniques = pd.factorize(series.astype("str"))
+    parts = pd.Series(uniques, dtype="str").str.split(",", n=2, expand=True)
+    coordinates = []
+    for column, limit in ((0, 90), (1, 180)):
+        if parts.shape[1] < 2:
+            values = np.full(len(uniques), np.nan)
+        else:
+            values = pd.to_numeric(parts[column], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            valid = parts[1].notna().to_numpy() & (values >= -limit) & (values <= limit)
+            values = np.where(valid, values, np.nan)
+        # Missing values have code -1 and pick up the NaN appended at the end
+        coordinates.append(np.append(values, np.nan)[codes])
+    return coordinates[0], coordinates[1]
+
+
+# Canonical location id: punctuation stripped and whitespace collapsed and trimmed.
+# Applying it to an already normalized value returns it unchanged.
+def normalize_location(series):
+    return series.str.replace(r'[^a-zA-Z0-9\s]', '', regex=True).str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+# Store repetitive string columns as categoricals. Rows still hold plain str values
+# (to_numpy, tolist, .str and factorize see the same strings), but each distinct value is
+# kept once and rows only carry small integer codes.
+def compact_strings(df, string_cols):
+    for col in string_cols:
+        if df[col].nunique() <= CATEGORY_MAX_FRACTION * len(df):
+            df[col] = df[col].astype("category")
+    return df
+
+
+# Location codes and canonical ids, computed once at load.
+# df is sorted by Location, so each location's incidents are a contiguous block of rows.
+# Location is normalized during cleaning, so its values are the ids.
+def build_groups(df):
+    codes, locations = pd.factorize(df["Location"], sort=True)
+    locations = np.asarray(locations, dtype=object)
+    return {"codes": codes, "locations": locations, "ids": locations}
+
+
+# Per-location view of the incidents at `rows` (ascending positions in df; None = all rows).
+# row_start/row_stop locate each location's incidents in df.iloc[rows].
+def group_view(df, groups, rows=None):
+    rows = np.arange(len(df)) if rows is None else np.asarray(rows)
+    codes = groups["codes"][rows]
+    present, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+    view = {"Location": groups["locations"][present]}
+    for col in FIRST_COLUMNS:
+        # First non-null value per location, as groupby().first() would give
+        values = df[col].to_numpy()[rows]
+        valid = pd.notna(values)
+        first_codes, first_idx = np.unique(codes[valid], return_index=True)
+        view[col] = pd.Series(values[valid][first_idx], index=first_codes).reindex(present).to_numpy()
+    view["Incident Count"] = counts
+    view["id"] = groups["ids"][present]
+    view["row_start"] = starts
+    view["row_stop"] = starts + counts
+    return pd.DataFrame(view)
+
+
+# Clean the raw workbook into the incident frame and its per-location grouping
+def build_frames(raw):
+    df = raw.copy()
+
+    # Clean missing values: separate numerical and non-numerical columns
+    numerical_cols = df.select_dtypes(include=['float64', 'int64']).columns
+    # "string" selects pandas' str dtype (the default for text from pandas 3), "object" older frames
+    string_cols = df.select_dtypes(include=['object', 'string']).columns
+    df[numerical_cols] = df[numerical_cols].fillna(0)
+    df[string_cols] = df[string_cols].fillna("-")
+
+    df["lat"], df["lon"] = parse_coordinates(df["Custom location (Lat, Lon)"])
+
+    # Normalize Location values (ensure consistency for IDs)
+    df["Location"] = normalize_location(df["Location"])
+    df = df.sort_values("Location", kind="stable").reset_index(drop=True)
+
+    # Extract Year of Incident if a date column exists
+    if "Date of Incident" in df.columns:
+        df["Year of Incident"] = pd.to_datetime(df["Date of Incident"], errors="coerce").dt.year
+
+    df = compact_strings(df, string_cols)
+    groups = build_groups(df)
+    return {
+        "df": df,
+        "groups": groups,
+        "grouped_df": group_view(df, groups),
+        "numerical_cols": list(numerical_cols),
+        "string_cols": list(string_cols),
+    }
+
+
+def read_source(path=SOURCE_FILE):
+    return pd.read_excel(path, sheet_name=SHEET_NAME)
+
+
+# Identify a workbook by mtime/size (cheap) and content hash (authoritative)
+def source_fingerprint(path, with_hash=True):
+    stat = os.stat(path)
+    fingerprint = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+
+def read_snapshot(snapshot_path):
+    try:
+        with open(snapshot_path, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+        return None
+    return snapshot
+
+
+# Write to a temp file and rename so concurrent workers never see a partial snapshot
+def write_snapshot(snapshot_path, fingerprint, frames):
+    directory = os.path.dirname(snapshot_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    snapshot = dict(frames, format=SNAPSHOT_FORMAT, fingerprint=fingerprint)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Return the snapshot if it still describes the workbook at `path`
+def valid_snapshot(path, snapshot_path):
+    snapshot = read_snapshot(snapshot_path)
+    if snapshot is None:
+        return None
+    stored = snapshot["fingerprint"]
+    current = source_fingerprint(path, with_hash=False)
+    if current["mtime_ns"] == stored["mtime_ns"] and current["size"] == stored["size"]:
+        return snapshot
+    # mtime changed (e.g. a fresh checkout); fall back to the content hash
+    current = source_fingerprint(path)
+    if current["sha256"] != stored["sha256"]:
+        return None
+    write_snapshot(snapshot_path, current, {key: snapshot[key] for key in DATASET_KEYS})
+    return dict(snapshot, fingerprint=current)
+
+
+# The cheap mtime/size part of a fingerprint, as source_fingerprint(path, with_hash=False) gives it
+def stat_part(fingerprint):
+    return fingerprint and {"mtime_ns": fingerprint["mtime_ns"], "size": fingerprint["size"]}
+
+
+# Short id of the workbook content, used to key anything derived from the dataset
+def dataset_version(fingerprint):
+    return f"{SNAPSHOT_FORMAT}-{fingerprint['sha256'][:12]}"
+
+
+# Hold an exclusive lock next to the snapshot so processes that see the same workbook
+# change (e.g. every gunicorn worker) rebuild it once instead of all at the same time
+@contextlib.contextmanager
+def snapshot_lock(snapshot_path):
+    try:
+        os.makedirs(os.path.dirname(snapshot_path) or ".", exist_ok=True)
+        lock_file = open(snapshot_path + ".lock", "a") if fcntl else None
+    except OSError:
+        lock_file = None
+    if lock_file is None:
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# The dataset of a snapshot; `fingerprint` identifies the workbook it was built from
+def snapshot_dataset(snapshot):
+    return dict({key: snapshot[key] for key in DATASET_KEYS},
+                version=dataset_version(snapshot["fingerprint"]), fingerprint=snapshot["fingerprint"])
+
+
+# Load the cleaned frames, rebuilding the snapshot only when the workbook changed
+def load_dataset(path=SOURCE_FILE, snapshot_path=SNAPSHOT_FILE):
+    if snapshot_path:
+        snapshot = valid_snapshot(path, snapshot_path)
+        if snapshot is None:
+            with snapshot_lock(snapshot_path):
+                # Another process may have rebuilt it while we waited for the lock
+                snapshot = valid_snapshot(path, snapshot_path)
+                if snapshot is None:
+                    return build_dataset(path, snapshot_path)
+        return snapshot_dataset(snapshot)
+    return build_dataset(path, snapshot_path)
+
+
+# Ingest the workbook and store the result as its snapshot
+def build_dataset(path, snapshot_path):
+    fingerprint = source_fingerprint(path)
+    frames = build_frames(read_source(path))
+    if snapshot_path:
+        try:
+            write_snapshot(snapshot_path, fingerprint, frames)
+        except OSError as e:
+            log.warning("snapshot_write_failed", extra={"path": snapshot_path, "error": str(e)})
+    return dict(frames, version=dataset_version(fingerprint), fingerprint=fingerprint)
+
+
+# Rebuild the snapshot of `path` in a low-priority child process (`python ingest.py`), so the
+# Excel parse and cleaning neither hold this process's GIL nor take CPU from the requests it serves
+def rebuild_snapshot(path, snapshot_path):
+    env = dict(os.environ, INCIDENTS_FILE=path, INCIDENTS_SNAPSHOT=snapshot_path)
+    command = [sys.executable, os.path.abspath(__file__)]
+    # Through nice(1) rather than a preexec_fn, which is not safe to run from a thread
+    if shutil.which("nice"):
+        command = ["nice", "-n", "10"] + command
+    result = subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"snapshot rebuild failed: {result.stderr.strip()[-500:]}")
+
+
+# Polls the workbook and hands a freshly loaded dataset to on_change(dataset) when its content
+# changes. The snapshot is rebuilt in a child process and loaded on the watcher's own thread,
+# so requests keep being served from the previous dataset until on_change swaps it in.
+# `dataset` is the one currently served (as returned by load_dataset): polling starts from
+# the workbook it was loaded from, so an unchanged workbook is never reloaded.
+class DatasetWatcher:
+    def __init__(self, on_change, dataset, path=SOURCE_FILE, snapshot_path=SNAPSHOT_FILE, interval=30.0):
+        self.on_change = on_change
+        self.version = dataset["version"]
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        # mtime/size last seen; without one the first check compares content hashes
+        self.fingerprint = stat_part(dataset.get("fingerprint"))
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Reload if the workbook changed since the last check; returns whether a new version was loaded
+    def check(self):
+        fingerprint = source_fingerprint(self.path, with_hash=False)
+        if fingerprint == self.fingerprint:
+            return False
+        # Touched or copied over with the same content: nothing to rebuild or load
+        if dataset_version(source_fingerprint(self.path)) == self.version:
+            self.fingerprint = fingerprint
+            return False
+        start = time.perf_counter()
+        if self.snapshot_path:
+            rebuild_snapshot(self.path, self.snapshot_path)
+        new_dataset = load_dataset(self.path, self.snapshot_path)
+        self.fingerprint = stat_part(new_dataset["fingerprint"])
+        if new_dataset["version"] == self.version:
+            return False
+        self.on_change(new_dataset)
+        log.info("dataset_reloaded", extra={
+            "previous_version": self.version,
+            "version": new_dataset["version"],
+            "ms": round((time.perf_counter() - start) * 1000, 1)
+        })
+        self.version = new_dataset["version"]
+        return True
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # Missing or half-written workbook: keep serving the current dataset and retry
+                log.warning("dataset_reload_failed", extra={"path": self.path, "error": repr(e)})
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="dataset-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+# Compare a cold Excel ingest with a snapshot load
+def compare_startup(path=SOURCE_FILE, snapshot_path=SNAPSHOT_FILE, repeat=5):
+    def best_of(fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    cold = best_of(lambda: load_dataset(path, snapshot_path=None))
+    load_dataset(path, snapshot_path)
+    warm = best_of(lambda: load_dataset(path, snapshot_path))
+    print(f"Cold Excel ingest: {cold * 1000:.1f} ms")
+    print(f"Snapshot load:     {warm * 1000:.1f} ms ({cold / warm:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    if "--compare" in sys.argv:
+        compare_startup()
+    else:
+        # Rebuild the snapshot ahead of deployment so workers start warm
+        start = time.perf_counter()
+        frames = load_dataset()
+        print(f"Snapshot ready at {SNAPSHOT_FILE}: {len(frames['df'])} incidents, "
+              f"{len(frames['grouped_df'])} locations ({time.perf_counter() - start:.2f}s)")
@@ -0,0 +1,152 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+
+# METRICS_ENABLED=0 removes all instrumentation; LOG_LEVEL=OFF silences the structured log
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+ROWS_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+# name -> (help text, bucket bounds)
+HISTOGRAMS = {
+    "dash_callback_seconds": ("Wall time spent in the callback function", TIME_BUCKETS),
+    "dash_callback_response_bytes": ("Serialized size of the callback response", BYTES_BUCKETS),
+    "dash_callback_input_rows": ("Rows of incident data the callback worked on", ROWS_BUCKETS),
+}
+
+log = logging.getLogger("bess")
+
+
+# One line of JSON per record: the message as "event" plus any `extra` fields
+class JsonFormatter(logging.Formatter):
+    RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message"}
+
+    def format(self, record):
+        entry = {"ts": round(record.created, 3), "level": record.levelname, "event": record.getMessage()}
+        entry.update({key: value for key, value in vars(record).items() if key not in self.RESERVED})
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=LOG_LEVEL):
+    log.handlers.clear()
+    log.propagate = False
+    if level == "OFF":
+        log.disabled = True
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    log.addHandler(handler)
+    log.setLevel(level)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# In-process histograms, one per (metric, callback)
+class Registry:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, metric, callback, value):
+        with self._lock:
+            key = (metric, callback)
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(HISTOGRAMS[metric][1])
+            self._histograms[key].observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {"buckets": list(h.buckets), "counts": list(h.counts), "sum": h.sum, "count": h.count}
+                for key, h in self._histograms.items()
+            }
+
+    # Prometheus text exposition format
+    def render(self):
+        snapshot = self.snapshot()
+        lines = []
+        for metric, (help_text, _) in HISTOGRAMS.items():
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+            for (name, callback), h in sorted(snapshot.items()):
+                if name != metric:
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(h["buckets"]) + ["+Inf"], h["counts"]):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{callback="{callback}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{callback="{callback}"}} {h["sum"]}')
+                lines.append(f'{metric}_count{{callback="{callback}"}} {h["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# Record the wall time of a Dash callback; its response size is recorded by install()
+def instrument(func):
+    if not METRICS_ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if has_request_context():
+            g.metrics_callback = func.__name__
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.observe("dash_callback_seconds", func.__name__, elapsed)
+            log.debug("callback", extra={"callback": func.__name__, "ms": round(elapsed * 1000, 2)})
+    return wrapper
+
+
+# Called from inside a callback with the number of data rows it processed
+def record_rows(callback, rows):
+    if METRICS_ENABLED:
+        registry.observe("dash_callback_input_rows", callback, rows)
+        log.debug("callback_rows", extra={"callback": callback, "rows": rows})
+
+
+# Hook response sizes of Dash callback requests and expose /metrics on the Flask server
+def install(server):
+    if not METRICS_ENABLED:
+        return
+
+    @server.after_request
+    def record_response_size(response):
+        callback = g.pop("metrics_callback", None)
+        if callback and not response.direct_passthrough:
+            size = response.calculate_content_length()
+            if size is None:
+                size = len(response.get_data())
+            registry.observe("dash_callback_response_bytes", callback, size)
+            log.info("callback_response", extra={"callback": callback, "bytes": size, "status": response.status_code})
+        return response
+
+    @server.route("/metrics")
+    def metrics_endpoint():
+        if request.args.get("format") == "json":
+            snapshot = [dict(h, metric=metric, callback=callback) for (metric, callback), h in registry.snapshot().items()]
+            return Response(json.dumps(snapshot), mimetype="application/json")
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
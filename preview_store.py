@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils import UNAVAILABLE_TITLE
+
+STORE_FILE = 'url_previews.sqlite3'
+LEGACY_JSON_FILE = 'url_previews.json'
+PREVIEW_FIELDS = ('title', 'description', 'image')
+# SQLite caps bound parameters per statement; look up long URL lists in batches
+LOOKUP_BATCH = 500
+# How long revision() may report a revision before reading it from the database again
+REVISION_TTL = float(os.getenv('PREVIEW_REVISION_SECONDS', '10'))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS previews (
+    url TEXT PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    image TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL DEFAULT 0
+)
+'''
+
+
+# 'ok', 'unavailable' (fetch failed, retry later) or 'skipped' (never fetched)
+def preview_status(preview):
+    if preview.get('title') == UNAVAILABLE_TITLE:
+        return 'unavailable'
+    if preview.get('title') in ('Invalid URL', 'Box.com Link (Preview Skipped)'):
+        return 'skipped'
+    return 'ok'
+
+
+# URL previews in SQLite: one indexed row per URL, readable concurrently by every
+# gunicorn worker (WAL mode) without loading the whole set into memory
+class PreviewStore:
+    def __init__(self, path=STORE_FILE, legacy_json=LEGACY_JSON_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._revision = None
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+        if legacy_json and os.path.exists(legacy_json) and not len(self):
+            self.import_json(legacy_json)
+
+    # SQLite connections must not be shared between threads or carried across fork()
+    # (gunicorn preloads the app in the master), so each thread of each process opens its own
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM previews').fetchone()[0]
+
+    def get(self, url):
+        row = self._connect().execute('SELECT * FROM previews WHERE url = ?', (url,)).fetchone()
+        return dict(row) if row else None
+
+    # {url: preview} for the URLs that have a stored preview
+    def get_many(self, urls):
+        urls = list(dict.fromkeys(urls))
+        found = {}
+        conn = self._connect()
+        for start in range(0, len(urls), LOOKUP_BATCH):
+            batch = urls[start:start + LOOKUP_BATCH]
+            placeholders = ', '.join('?' * len(batch))
+            for row in conn.execute(f'SELECT * FROM previews WHERE url IN ({placeholders})', batch):
+                found[row['url']] = dict(row)
+        return found
+
+    # Changes whenever previews are written (e.g. by fetch_previews.py in another process), so
+    # anything rendered from previews can be cached under it. Read at most once per `ttl`.
+    def revision(self, ttl=None):
+        ttl = REVISION_TTL if ttl is None else ttl
+        checked = self._revision
+        if checked is None or time.monotonic() - checked[0] >= ttl:
+            row = self._connect().execute('SELECT COUNT(*), MAX(fetched_at) FROM previews').fetchone()
+            checked = self._revision = (time.monotonic(), tuple(row))
+        return checked[1]
+
+    def put_many(self, previews):
+        rows = [
+            (
+                url,
+                *(preview.get(field) or '' for field in PREVIEW_FIELDS),
+                preview.get('status') or preview_status(preview),
+                preview.get('etag'),
+                preview.get('last_modified'),
+                preview.get('fetched_at') or time.time(),
+            )
+            for url, preview in previews.items()
+        ]
+        with self._connect() as conn:
+            conn.executemany('INSERT OR REPLACE INTO previews VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def put(self, url, preview):
+        self.put_many({url: preview})
+
+    # One-time import of the old monolithic url_previews.json; entries are dated from the file
+    def import_json(self, path=LEGACY_JSON_FILE):
+        with open(path) as f:
+            previews = json.load(f)
+        written_at = os.path.getmtime(path)
+        for preview in previews.values():
+            preview.setdefault('fetched_at', written_at)
+        self.put_many(previews)
+        return len(previews)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the URL preview store')
+    parser.add_argument('--import-json', metavar='PATH', help='import previews from a url_previews.json file')
+    args = parser.parse_args()
+
+    store = PreviewStore(legacy_json=None)
+    if args.import_json:
+        print(f"Imported {store.import_json(args.import_json)} previews into {STORE_FILE}")
+    print(f"{STORE_FILE}: {len(store)} previews")
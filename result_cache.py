@@ -0,0 +1,89 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+DEFAULT_MAX_BYTES = int(os.getenv("RESULT_CACHE_MB", "64")) * 1024 * 1024
+
+
+# Approximate in-memory footprint of a cached value
+def estimate_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(estimate_size(item) for item in value.values())
+    # numpy arrays, and objects built from them that report their own size (SpatialIndex)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    # Plotly figures: the traces and layout they would serialize
+    if hasattr(value, "to_plotly_json"):
+        return estimate_size(value.to_plotly_json())
+    return sys.getsizeof(value)
+
+
+# Least-recently-used cache bounded by the total estimated size of its entries, and/or
+# by their number (max_bytes=None bounds it by max_entries alone, without sizing values)
+class ResultCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, sizeof=estimate_size, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = 0 if self.max_bytes is None else self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            # Values larger than the whole budget are returned but never cached
+            if self.max_bytes is not None and size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self._over_budget():
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+        return value
+
+    def _over_budget(self):
+        return ((self.max_bytes is not None and self.total_bytes > self.max_bytes)
+                or (self.max_entries is not None and len(self._entries) > self.max_entries))
+
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+# Queries containing any of these are real regexes and must go through str.contains
+REGEX_CHARS = set(".^$*+?{}[]\\|()")
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# Case-folded substring index over one string column.
+# Rows are mapped to codes of the column's distinct values, and each distinct
+# value is indexed by its trigrams, so a query only touches candidate values.
+class SubstringIndex:
+    def __init__(self, series):
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        self.codes = codes
+        self.values = [value.lower() if isinstance(value, str) else None for value in uniques]
+        self.postings = {}
+        for value_id, value in enumerate(self.values):
+            if value is None:
+                continue
+            for gram in trigrams(value):
+                self.postings.setdefault(gram, []).append(value_id)
+
+    def candidates(self, query):
+        grams = trigrams(query)
+        if not grams:
+            return range(len(self.values))
+        # Intersect the shortest postings lists first
+        lists = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        result = set(lists[0])
+        for postings in lists[1:]:
+            if not result:
+                break
+            result.intersection_update(postings)
+        return result
+
+    # Row positions whose value contains `query`, ignoring case
+    def search(self, query):
+        query = query.lower()
+        matched = [value_id for value_id in self.candidates(query)
+                   if self.values[value_id] is not None and query in self.values[value_id]]
+        return np.flatnonzero(np.isin(self.codes, matched))
+
+
+# Exact-match index over one numerical column
+class ValueIndex:
+    def __init__(self, series):
+        self.rows = {value: np.sort(positions) for value, positions in series.groupby(series, sort=False).indices.items()}
+
+    def search(self, value):
+        return self.rows.get(value, np.empty(0, dtype=np.intp))
+
+
+# Per-column indexes used by filter_dataframe; columns without an index fall back to a scan
+class FilterIndex:
+    def __init__(self, df, string_cols, numerical_cols):
+        self.string = {col: SubstringIndex(df[col]) for col in string_cols if col in df.columns}
+        self.numerical = {col: ValueIndex(df[col]) for col in numerical_cols if col in df.columns}
+
+    # Row positions matching the filter, or None when the query needs a full scan
+    def lookup(self, column, value):
+        if column in self.numerical:
+            return self.numerical[column].search(value)
+        if column in self.string and isinstance(value, str) and not REGEX_CHARS.intersection(value):
+            return self.string[column].search(value)
+        return None
+
+
+# The original full-frame scan, kept for regex queries and unindexed columns
+def scan_rows(df, column, value, numerical=False):
+    if numerical:
+        mask = df[column] == value
+    else:
+        mask = df[column].str.contains(value, case=False, na=False)
+    return np.flatnonzero(mask.to_numpy())
@@ -0,0 +1,116 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Web-mercator tile size in pixels, as used by mapbox
+TILE_SIZE = 256
+# Width of the screen-space grid cells points are clustered into
+CELL_PIXELS = 60
+MAX_LAT = 85.05112878
+
+
+# Project lat/lon onto the unit web-mercator square (x east, y south)
+def mercator(lat, lon):
+    lat = np.clip(np.asarray(lat, dtype=float), -MAX_LAT, MAX_LAT)
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0
+    sin_lat = np.sin(np.radians(lat))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+# (west, south, east, north) visible for a mapbox centre/zoom at a given pixel size
+def viewport_bounds(center, zoom, width=900, height=600):
+    x, y = mercator(center["lat"], center["lon"])
+    world = TILE_SIZE * 2.0 ** zoom
+    half_w, half_h = width / 2 / world, height / 2 / world
+    if half_w >= 0.5:
+        west, east = -180.0, 180.0
+    else:
+        west = float((x - half_w) * 360.0 - 180.0)
+        east = float((x + half_w) * 360.0 - 180.0)
+        west = (west + 180.0) % 360.0 - 180.0
+        east = (east + 180.0) % 360.0 - 180.0
+    north, south = (float(np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * value))))) for value in (max(y - half_h, 0.0), min(y + half_h, 1.0)))
+    return west, south, east, north
+
+
+# Centre, zoom and bounds of the view described by a Graph's relayoutData, or None
+def viewport_from_relayout(relayout, width=900, height=600):
+    if not relayout or "mapbox.zoom" not in relayout or "mapbox.center" not in relayout:
+        return None
+    center, zoom = relayout["mapbox.center"], relayout["mapbox.zoom"]
+    corners = (relayout.get("mapbox._derived") or {}).get("coordinates")
+    if corners:
+        lons = [corner[0] for corner in corners]
+        lats = [corner[1] for corner in corners]
+        # mapbox reports corners clockwise from the top left; west > east means the view wraps the antimeridian
+        west, east = (lons[0] + 180.0) % 360.0 - 180.0, (lons[1] + 180.0) % 360.0 - 180.0
+        if max(lons) - min(lons) >= 360.0:
+            west, east = -180.0, 180.0
+        bounds = (west, min(lats), east, max(lats))
+    else:
+        bounds = viewport_bounds(center, zoom, width, height)
+    return center, zoom, bounds
+
+
+# Grid index over point coordinates, built once per point set.
+# Points are kept sorted by mercator x so a viewport is a searchsorted range plus a y mask.
+class SpatialIndex:
+    def __init__(self, lat, lon, weights=None):
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        weights = np.ones(len(lat)) if weights is None else np.asarray(weights, dtype=float)
+        x, y = mercator(lat, lon)
+        self.order = np.argsort(x, kind="stable")
+        self.x, self.y = x[self.order], y[self.order]
+        self.lat, self.lon = lat[self.order], lon[self.order]
+        self.weights = weights[self.order]
+
+    def __len__(self):
+        return len(self.order)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.order, self.x, self.y, self.lat, self.lon, self.weights))
+
+    # Sorted-order slots of the points inside (west, south, east, north)
+    def _slots(self, bounds):
+        west, south, east, north = bounds
+        x_west, x_east = mercator([0, 0], [west, east])[0]
+        y_north, y_south = mercator([north, south], [0, 0])[1]
+        if west <= east:
+            ranges = [(x_west, x_east)]
+        else:
+            ranges = [(x_west, 1.0), (0.0, x_east)]
+        slots = np.concatenate([
+            np.arange(np.searchsorted(self.x, lo, side="left"), np.searchsorted(self.x, hi, side="right"))
+            for lo, hi in ranges
+        ])
+        return slots[(self.y[slots] >= y_north) & (self.y[slots] <= y_south)]
+
+    # Positions (in the input order) of the points inside the bounds
+    def query(self, bounds):
+        return np.sort(self.order[self._slots(bounds)])
+
+    # Points inside the bounds, merged per CELL_PIXELS screen cell at `zoom`.
+    # Each row is a cluster: mean lat/lon, number of points, summed weight, and the
+    # input position of its point when it holds exactly one (else -1).
+    def clusters(self, bounds, zoom, selected=None):
+        slots = self._slots(bounds)
+        cells_across = max(int(TILE_SIZE * 2 ** int(zoom) / CELL_PIXELS), 1)
+        cell_x = np.minimum((self.x[slots] * cells_across).astype(np.int64), cells_across - 1)
+        cell_y = np.minimum((self.y[slots] * cells_across).astype(np.int64), cells_across - 1)
+        keys, first, inverse, points = np.unique(cell_x * cells_across + cell_y, return_index=True, return_inverse=True, return_counts=True)
+        positions = self.order[slots]
+        clusters = pd.DataFrame({
+            "lat": np.bincount(inverse, weights=self.lat[slots]) / points,
+            "lon": np.bincount(inverse, weights=self.lon[slots]) / points,
+            "points": points,
+            "weight": np.bincount(inverse, weights=self.weights[slots]),
+            "position": np.where(points == 1, positions[first], -1),
+        })
+        clusters["selected"] = False
+        if selected is not None:
+            clusters.loc[np.unique(inverse[positions == selected]), "selected"] = True
+        return clusters
@@ -0,0 +1,5 @@
+import os
+
+# Importing app loads the dataset; keep its workbook watcher and JSON log out of the tests
+os.environ.setdefault("DATASET_RELOAD_SECONDS", "0")
+os.environ.setdefault("LOG_LEVEL", "OFF")
@@ -0,0 +1,173 @@
+// Drives assets/selection.js (the clientside selection callbacks) against a stubbed DOM
+// and dash_clientside. Run with `node --test tests/`, or through tests/test_selection_js.py.
+const assert = require("node:assert");
+const fs = require("node:fs");
+const path = require("node:path");
+const test = require("node:test");
+
+const SOURCE = fs.readFileSync(path.join(__dirname, "..", "assets", "selection.js"), "utf8");
+const NO_UPDATE = "NO_UPDATE";
+
+class Patch {
+    constructor() { this.operations = []; }
+    assign(location, value) { this.operations.push([location, value]); return this; }
+    build() { return {operations: this.operations}; }
+}
+
+function cardDomId(index) {
+    return '{"index":' + JSON.stringify(index) + ',"type":"card"}';
+}
+
+// Fresh page with the script loaded, so state kept by the script starts empty in every test
+function page() {
+    const cards = {};
+    const list = {id: "left-section", offsetTop: 100, scrollTop: 0};
+    const setProps = [];
+    global.document = {
+        getElementById: id => id === "left-section" ? list : (cards[id] || null),
+        querySelectorAll: () => Object.values(cards).filter(card => card.className.includes("selected")),
+    };
+    global.setTimeout = fn => fn();
+    global.window = {dash_clientside: {
+        no_update: NO_UPDATE,
+        Patch,
+        set_props: (id, props) => {
+            setProps.push([id, props]);
+            const card = cards[cardDomId(id.index)];
+            if (card) {
+                card.className = props.className;
+            }
+        },
+    }};
+    new Function(SOURCE)();
+    const dc = global.window.dash_clientside;
+
+    return {
+        cards, list, setProps,
+        addCard(index, lat, lon, offsetTop, className) {
+            const attrs = {"data-lat": lat, "data-lon": lon};
+            cards[cardDomId(index)] = {
+                id: cardDomId(index), className: className || "card", offsetTop,
+                getAttribute: name => attrs[name] === undefined ? null : String(attrs[name]),
+            };
+        },
+        // Call a callback as Dash would after `triggeredId` changed to `value`
+        call(name, triggeredId, value, ...args) {
+            dc.callback_context = {triggered_id: triggeredId, triggered: [{value}]};
+            try {
+                return dc.selection[name](...args);
+            } finally {
+                delete dc.callback_context;
+            }
+        },
+    };
+}
+
+test("a card click selects its location with the card's coordinates", () => {
+    const p = page();
+    p.addCard("Alpha Site", 10.5, 20.25, 300);
+
+    const result = p.call("select", {type: "card", index: "Alpha Site"}, 1, null, [1]);
+
+    assert.deepStrictEqual(result, ["Alpha Site", {lat: 10.5, lon: 20.25}, "Selected location (card): Alpha Site"]);
+});
+
+test("a card without coordinates selects without a map focus", () => {
+    const p = page();
+    p.addCard("Beta Site", NaN, NaN, 300);
+
+    const [selected, focus] = p.call("select", {type: "card", index: "Beta Site"}, 1, null, [1]);
+
+    assert.strictEqual(selected, "Beta Site");
+    assert.strictEqual(focus, null);
+});
+
+test("cards added to the list with n_clicks 0 do not select", () => {
+    const p = page();
+    p.addCard("Alpha Site", 10.5, 20.25, 300);
+
+    const result = p.call("select", {type: "card", index: "Alpha Site"}, 0, null, [0]);
+
+    assert.deepStrictEqual(result, [NO_UPDATE, NO_UPDATE, NO_UPDATE]);
+});
+
+test("a map click on a single location selects it", () => {
+    const p = page();
+
+    const result = p.call("select", "map-graph", 1, {points: [{customdata: "Zeta", lat: 5, lon: 6}]}, []);
+
+    assert.deepStrictEqual(result, ["Zeta", {lat: 5, lon: 6}, "Selected location (map): Zeta"]);
+});
+
+test("a map click on a cluster is ignored", () => {
+    const p = page();
+
+    const result = p.call("select", "map-graph", 1, {points: [{customdata: "", lat: 1, lon: 2}]}, []);
+
+    assert.deepStrictEqual(result, [NO_UPDATE, NO_UPDATE, NO_UPDATE]);
+});
+
+test("a rendered card is highlighted and scrolled to, and the previous one is cleared", () => {
+    const p = page();
+    p.addCard("Alpha Site", 10.5, 20.25, 300);
+    p.addCard("Gamma", 1, 2, 700, "card selected");
+
+    const target = p.call("show_card", "selected-location", "Alpha Site", "Alpha Site", {limit: 25});
+
+    assert.strictEqual(target, NO_UPDATE);
+    assert.strictEqual(p.cards[cardDomId("Gamma")].className, "card");
+    assert.strictEqual(p.cards[cardDomId("Alpha Site")].className, "card selected");
+    assert.strictEqual(p.list.scrollTop, 190);
+});
+
+test("a card outside the window is requested through card-target and scrolled to once rendered", () => {
+    const p = page();
+    p.addCard("Alpha Site", 10.5, 20.25, 300, "card selected");
+
+    const target = p.call("show_card", "selected-location", "Zeta", "Zeta", {limit: 25});
+
+    assert.strictEqual(target.id, "Zeta");
+    assert.strictEqual(typeof target.requested, "number");
+    assert.strictEqual(p.cards[cardDomId("Alpha Site")].className, "card");
+
+    // The server renders the window up to Zeta (already highlighted) and updates rendered-cards
+    p.addCard("Zeta", 5, 6, 2000, "card selected");
+    assert.strictEqual(p.call("show_card", "rendered-cards", {limit: 40}, "Zeta", {limit: 40}), NO_UPDATE);
+    assert.strictEqual(p.list.scrollTop, 1890);
+
+    // Later growth of the window does not scroll again
+    p.list.scrollTop = 0;
+    p.call("show_card", "rendered-cards", {limit: 65}, "Zeta", {limit: 65});
+    assert.strictEqual(p.list.scrollTop, 0);
+});
+
+test("the map recolours markers and recentres on the selection", () => {
+    const p = page();
+    const figure = {data: [{customdata: ["Alpha Site", "Gamma", ""]}], layout: {}};
+
+    const [patch, viewport] = p.call("show_map", "selected-location", "Alpha Site",
+        "Alpha Site", {lat: 10.5, lon: 20.25}, figure, {clustered: false});
+
+    assert.deepStrictEqual(patch.operations[0], [["data", 0, "marker", "color"], ["red", "blue", "purple"]]);
+    assert.deepStrictEqual(patch.operations[1], [["layout", "mapbox", "center"], {lat: 10.5, lon: 20.25}]);
+    assert.strictEqual(viewport, NO_UPDATE);
+});
+
+test("a clustered map hands the new viewport to the server", () => {
+    const p = page();
+    const figure = {data: [{customdata: ["", "Zeta"]}], layout: {}};
+
+    const [, viewport] = p.call("show_map", "selected-location", "Zeta", "Zeta", {lat: 5, lon: 6}, figure, {clustered: true});
+
+    assert.deepStrictEqual(viewport, {center: {lat: 5, lon: 6}, zoom: 10});
+});
+
+test("without a focus the map is only recoloured", () => {
+    const p = page();
+    const figure = {data: [{customdata: ["Beta Site"]}], layout: {}};
+
+    const [patch, viewport] = p.call("show_map", "selected-location", "Beta Site", "Beta Site", null, figure, {clustered: true});
+
+    assert.strictEqual(patch.operations.length, 1);
+    assert.strictEqual(viewport, NO_UPDATE);
+});
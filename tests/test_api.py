@@ -0,0 +1,181 @@
+import gzip
+import json
+
+import pytest
+
+import api
+import app
+from api import encode_cursor
+
+
+@pytest.fixture
+def client():
+    original = app.dataset
+    yield app.server.test_client()
+    if app.dataset is not original:
+        app.use_dataset(original)
+
+
+def get_page(client, path, status=200, **kwargs):
+    response = client.get(path, **kwargs)
+    assert response.status_code == status, response.data
+    return response, json.loads(response.data) if response.data else None
+
+
+# Every page of `path`, following next_cursor
+def walk(client, path, limit):
+    records, pages, cursor = [], [], None
+    while True:
+        separator = "&" if "?" in path else "?"
+        url = f"{path}{separator}limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+        _, page = get_page(client, url)
+        pages.append(page)
+        records.extend(page["data"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return records, pages
+
+
+def test_walking_every_page_returns_each_incident_once_in_order(client):
+    df = app.dataset["df"]
+    records, pages = walk(client, "/api/incidents?fields=Location,Description", limit=10)
+
+    assert [record["Location"] for record in records] == df["Location"].tolist()
+    assert [record["Description"] for record in records] == df["Description"].tolist()
+    assert [page["offset"] for page in pages] == list(range(0, len(df), 10))
+    assert all(page["total"] == len(df) and page["count"] == len(page["data"]) for page in pages)
+
+
+def test_walking_every_location_page(client):
+    grouped_df = app.dataset["grouped_df"]
+    records, _ = walk(client, "/api/locations", limit=7)
+
+    assert [record["id"] for record in records] == grouped_df["id"].tolist()
+    assert sum(record["Incident Count"] for record in records) == len(app.dataset["df"])
+
+
+def test_filtered_total_matches_the_dashboard_filter(client):
+    df = app.dataset["df"]
+    expected = df[df["Country"].str.contains("korea", case=False)]
+
+    _, page = get_page(client, "/api/incidents?column=Country&value=korea&limit=5")
+    records, _ = walk(client, "/api/incidents?column=Country&value=korea&fields=Location", limit=5)
+    _, locations = get_page(client, "/api/locations?column=Country&value=korea&limit=1")
+
+    assert page["total"] == len(expected) > 5
+    assert [record["Location"] for record in records] == expected["Location"].tolist()
+    assert locations["total"] == expected["Location"].nunique()
+
+
+def test_equivalent_filters_share_a_page(client):
+    response, page = get_page(client, "/api/incidents?column=Country&value=korea&limit=5")
+    other, other_page = get_page(client, "/api/incidents?column=Country&value= Korea &limit=5")
+
+    assert other.headers["ETag"] == response.headers["ETag"]
+    assert other_page == page
+
+
+def test_numerical_filter_matches_exactly(client):
+    df = app.dataset["df"]
+    value = df["Capacity (MW)"].value_counts().index[0]
+
+    _, page = get_page(client, f"/api/incidents?column=Capacity (MW)&value={value}&fields=Capacity (MW)&limit=1000")
+
+    assert page["total"] == int((df["Capacity (MW)"] == value).sum())
+    assert {record["Capacity (MW)"] for record in page["data"]} == {value}
+
+
+def test_fields_project_and_dedupe(client):
+    _, incidents = get_page(client, "/api/incidents?fields=Country, Location,Country&limit=3")
+    _, locations = get_page(client, "/api/locations?limit=3")
+
+    assert [list(record) for record in incidents["data"]] == [["Country", "Location"]] * 3
+    assert not set(api.HIDDEN_LOCATION_FIELDS) & set(locations["data"][0])
+
+
+@pytest.mark.parametrize("query", [
+    "fields=Custom location (Lat, Lon)",
+    "fields=Location,Custom location (Lat, Lon),Country",
+    "fields=Location&fields=Custom location (Lat, Lon)&fields=Country",
+])
+def test_fields_with_commas_in_their_names(client, query):
+    df = app.dataset["df"]
+    _, page = get_page(client, f"/api/incidents?{query}&limit=3")
+
+    assert "Custom location (Lat, Lon)" in page["data"][0]
+    assert [record["Custom location (Lat, Lon)"] for record in page["data"]] == df["Custom location (Lat, Lon)"].head(3).tolist()
+    if "Country" in query:
+        assert list(page["data"][0]) == ["Location", "Custom location (Lat, Lon)", "Country"]
+
+
+def test_unknown_fields_are_named_in_the_error(client):
+    _, error = get_page(client, "/api/incidents?fields=Location,Lat, Lon", status=400)
+    assert error["error"] == "Unknown fields: Lat, Lon."
+
+
+def test_unchanged_page_revalidates_with_304(client):
+    response, _ = get_page(client, "/api/incidents?column=Country&value=korea&limit=5")
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    revalidated, _ = get_page(client, "/api/incidents?column=Country&value=korea&limit=5", status=304,
+                              headers={"If-None-Match": etag})
+    assert revalidated.headers["ETag"] == etag
+    # Another page, or the same one after the dataset changed, has another ETag
+    get_page(client, "/api/incidents?column=Country&value=korea&limit=6", headers={"If-None-Match": etag})
+    app.use_dataset(dict(app.dataset, version="reloaded"))
+    get_page(client, "/api/incidents?column=Country&value=korea&limit=5", headers={"If-None-Match": etag})
+
+
+def test_cursor_from_a_previous_dataset_is_gone(client):
+    _, page = get_page(client, "/api/incidents?limit=5")
+
+    app.use_dataset(dict(app.dataset, version="reloaded"))
+
+    _, error = get_page(client, f"/api/incidents?limit=5&cursor={page['next_cursor']}", status=410)
+    assert "changed" in error["error"]
+
+
+@pytest.mark.parametrize("query", [
+    "column=Country",
+    "value=korea",
+    "column=Country&value=",
+    "column=Nope&value=1",
+    "column=Event Date&value=2020",
+    "column=lat&value=10",
+    "column=Country&value=   ",
+    "column=Capacity (MW)&value=big",
+    "column=Capacity (MW)&value=nan",
+    "column=Capacity (MW)&value=inf",
+    "column=Description&value=fire (",
+    "fields=Location,Nope",
+    "limit=ten",
+    "limit=0",
+    f"limit={api.MAX_LIMIT + 1}",
+    "cursor=!!!",
+    "cursor=bm90IGEgY3Vyc29y",
+])
+def test_invalid_queries_are_rejected(client, query):
+    for kind in ("incidents", "locations"):
+        response, error = get_page(client, f"/api/{kind}?{query}", status=400)
+        assert response.mimetype == "application/json" and error["error"]
+
+
+@pytest.mark.parametrize("offset", [-1, 10 ** 6])
+def test_cursor_offsets_out_of_range_are_rejected(client, offset):
+    cursor = encode_cursor(app.dataset["version"], offset)
+    _, error = get_page(client, f"/api/incidents?cursor={cursor}", status=400)
+    assert error["error"] == "Invalid cursor."
+
+
+def test_large_pages_are_gzipped_for_clients_that_accept_it(client):
+    limit = api.GZIP_MIN_ROWS + 1
+    plain, page = get_page(client, f"/api/incidents?limit={limit}")
+    compressed = client.get(f"/api/incidents?limit={limit}", headers={"Accept-Encoding": "gzip"})
+    small = client.get(f"/api/incidents?limit={api.GZIP_MIN_ROWS}", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+    assert json.loads(gzip.decompress(compressed.data)) == page
+    assert "Content-Encoding" not in small.headers
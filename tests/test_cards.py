@@ -0,0 +1,90 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from plotly.utils import PlotlyJSONEncoder
+
+import app
+import ingest
+import preview_store as preview_store_module
+from preview_store import PreviewStore
+
+
+def card_text(card):
+    return json.dumps(card.to_plotly_json(), cls=PlotlyJSONEncoder)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = PreviewStore(str(tmp_path / "previews.sqlite3"), legacy_json=None)
+    monkeypatch.setattr(app, "preview_store", store)
+    monkeypatch.setattr(preview_store_module, "REVISION_TTL", 0)
+    app.card_cache.clear()
+    yield store
+    app.card_cache.clear()
+
+
+def test_store_revision_changes_when_another_writer_adds_previews(tmp_path):
+    path = str(tmp_path / "previews.sqlite3")
+    reader, writer = PreviewStore(path, legacy_json=None), PreviewStore(path, legacy_json=None)
+    before = reader.revision(ttl=0)
+
+    writer.put("https://example.com/a", {"title": "A", "fetched_at": time.time()})
+
+    # Within the TTL the last read is reused; once it passes the write is seen
+    assert reader.revision(ttl=3600) == before
+    assert reader.revision(ttl=0) != before
+
+
+def test_cached_card_shows_previews_fetched_after_it_was_built(store):
+    data = app.dataset
+    grouped = data["grouped_df"]
+    df = data["df"]
+    for position in range(len(grouped)):
+        row = grouped.iloc[position]
+        urls = [url for url in df.iloc[row["row_start"]:row["row_stop"]]["Source URL 1"].tolist()
+                if isinstance(url, str) and url.startswith("http")]
+        if urls:
+            break
+    else:
+        pytest.skip("no location with a source URL")
+
+    before = app.get_card(data, None, df, grouped, position, None)
+    assert "Freshly fetched" not in card_text(before)
+    assert app.get_card(data, None, df, grouped, position, None) is before
+
+    store.put(urls[0], {"title": "Freshly fetched", "description": "", "image": "", "fetched_at": time.time()})
+
+    assert "Freshly fetched" in card_text(app.get_card(data, None, df, grouped, position, None))
+
+
+def test_unopenable_store_leaves_the_dashboard_without_previews(tmp_path, monkeypatch):
+    assert app.open_preview_store(str(tmp_path / "missing" / "previews.sqlite3"), legacy_json=None) is None
+    legacy_json = tmp_path / "url_previews.json"
+    legacy_json.write_text("{not json")
+    assert app.open_preview_store(str(tmp_path / "previews.sqlite3"), str(legacy_json)) is None
+
+    monkeypatch.setattr(app, "preview_store", None)
+    app.card_cache.clear()
+    data = app.dataset
+    try:
+        card = app.get_card(data, None, data["df"], data["grouped_df"], 0, None)
+    finally:
+        app.card_cache.clear()
+    assert data["grouped_df"].iloc[0]["Location"] in card_text(card)
+
+
+def test_app_imports_where_the_store_cannot_be_created(tmp_path):
+    # A directory in the store's place makes sqlite fail to open it
+    (tmp_path / preview_store_module.STORE_FILE).mkdir()
+    env = dict(os.environ, INCIDENTS_FILE=os.path.abspath(ingest.SOURCE_FILE),
+               INCIDENTS_SNAPSHOT=str(tmp_path / "incidents.snapshot.pkl"),
+               PYTHONPATH=os.path.dirname(os.path.abspath(app.__file__)))
+    result = subprocess.run([sys.executable, "-c", "import app; print(app.preview_store)"],
+                            cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "None"
@@ -0,0 +1,196 @@
+import logging
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+import app
+import ingest
+from ingest import SHEET_NAME, DatasetWatcher, load_dataset, read_source
+
+
+@pytest.fixture(scope="module")
+def raw():
+    return read_source()
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch, raw):
+    path = str(tmp_path / "incidents.xlsx")
+    snapshot = str(tmp_path / "incidents.snapshot.pkl")
+    # The snapshot rebuild runs `python ingest.py`, which reads these
+    monkeypatch.setenv("INCIDENTS_FILE", path)
+    monkeypatch.setenv("INCIDENTS_SNAPSHOT", snapshot)
+    raw.head(40).to_excel(path, sheet_name=SHEET_NAME, index=False)
+    return path, snapshot
+
+
+# Replace the workbook at `path` the way an editor saving over it would
+def replace_workbook(path, frame):
+    tmp_path = path + ".new.xlsx"
+    frame.to_excel(tmp_path, sheet_name=SHEET_NAME, index=False)
+    os.replace(tmp_path, path)
+
+
+@pytest.fixture
+def served():
+    # The watcher swaps datasets into the app; put the real one back afterwards
+    original = app.dataset
+    yield
+    app.use_dataset(original)
+
+
+def test_replaced_workbook_is_reloaded(workbook, raw):
+    path, snapshot = workbook
+    loaded = []
+    watcher = DatasetWatcher(loaded.append, load_dataset(path, snapshot), path, snapshot)
+    version = watcher.version
+
+    replace_workbook(path, raw.head(60))
+
+    assert watcher.check()
+    assert [len(dataset["df"]) for dataset in loaded] == [60]
+    assert watcher.version == loaded[0]["version"] != version
+    # Polling again finds nothing new
+    assert not watcher.check()
+    assert len(loaded) == 1
+
+
+def test_unchanged_workbook_is_not_reloaded(workbook, monkeypatch):
+    path, snapshot = workbook
+    watcher = DatasetWatcher(pytest.fail, load_dataset(path, snapshot), path, snapshot)
+    # Neither the first check after startup nor a touch or same-content copy rebuild anything
+    monkeypatch.setattr(ingest, "rebuild_snapshot", lambda *args: pytest.fail("snapshot rebuilt"))
+
+    assert not watcher.check()
+    os.utime(path, ns=(0, 0))
+    assert not watcher.check()
+    shutil.copy(path, path + ".copy")
+    os.replace(path + ".copy", path)
+    assert not watcher.check()
+
+
+def test_half_written_workbook_keeps_the_current_dataset(workbook, raw):
+    path, snapshot = workbook
+    loaded = []
+    watcher = DatasetWatcher(loaded.append, load_dataset(path, snapshot), path, snapshot)
+    version = watcher.version
+
+    replace_workbook(path, raw.head(60))
+    with open(path, "rb") as f:
+        content = f.read()
+    with open(path, "wb") as f:
+        f.write(content[:len(content) // 2])
+
+    with pytest.raises(Exception):
+        watcher.check()
+    assert loaded == [] and watcher.version == version
+
+    # Once the write completes the next check picks it up
+    with open(path, "wb") as f:
+        f.write(content)
+    assert watcher.check()
+    assert len(loaded[0]["df"]) == 60
+
+
+def test_callbacks_succeed_while_the_dataset_is_swapped(workbook, raw, served):
+    path, snapshot = workbook
+    app.use_dataset(load_dataset(path, snapshot))
+    watcher = DatasetWatcher(app.use_dataset, app.dataset, path, snapshot)
+    client = app.server.test_client()
+    failures = []
+    swapped = threading.Event()
+
+    def browse():
+        filter_spec = {"column": "Country", "value": "korea"}
+        while not swapped.is_set():
+            try:
+                app.update_bar_plot(filter_spec, "Country")
+                app.update_bar_plot(None, "Cause")
+                for url in ("/api/incidents?column=Country&value=korea", "/api/locations"):
+                    response = client.get(url)
+                    if response.status_code != 200:
+                        failures.append((url, response.status_code))
+                    response.get_json()
+            except Exception as e:
+                failures.append(repr(e))
+
+    thread = threading.Thread(target=browse)
+    thread.start()
+    try:
+        replace_workbook(path, raw.head(60))
+        assert watcher.check()
+    finally:
+        swapped.set()
+        thread.join()
+
+    assert failures == []
+    assert len(app.dataset["df"]) == 60
+    assert client.get("/api/incidents").get_json()["total"] == 60
+
+
+@pytest.fixture
+def reload_log(monkeypatch):
+    # The tests run with logging off; collect the watcher's records directly
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    log = logging.getLogger("bess")
+    level = log.level
+    monkeypatch.setattr(log, "disabled", False)
+    log.setLevel(logging.INFO)
+    log.addHandler(handler)
+    yield records
+    log.removeHandler(handler)
+    log.setLevel(level)
+
+
+def test_reload_time_is_logged(workbook, raw, reload_log):
+    path, snapshot = workbook
+    watcher = DatasetWatcher(lambda dataset: None, load_dataset(path, snapshot), path, snapshot)
+    replace_workbook(path, raw.head(60))
+
+    start = time.perf_counter()
+    assert watcher.check()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    [reloaded] = [record for record in reload_log if record.getMessage() == "dataset_reloaded"]
+    assert reloaded.version == watcher.version
+    assert 0 < reloaded.ms <= elapsed_ms
+
+
+def test_requests_are_served_while_the_snapshot_is_rebuilt(workbook, raw, served, monkeypatch):
+    path, snapshot = workbook
+    app.use_dataset(load_dataset(path, snapshot))
+    watcher = DatasetWatcher(app.use_dataset, app.dataset, path, snapshot)
+    version = watcher.version
+    client = app.server.test_client()
+    rebuilding, rebuilt = threading.Event(), threading.Event()
+    rebuild_snapshot = ingest.rebuild_snapshot
+
+    def observed_rebuild(*args):
+        rebuilding.set()
+        try:
+            rebuild_snapshot(*args)
+        finally:
+            rebuilt.set()
+
+    monkeypatch.setattr(ingest, "rebuild_snapshot", observed_rebuild)
+    replace_workbook(path, raw.head(60))
+    thread = threading.Thread(target=watcher.check)
+    thread.start()
+    try:
+        assert rebuilding.wait(10)
+        start = time.perf_counter()
+        app.update_bar_plot({"column": "Country", "value": "korea"}, "Cause")
+        response = client.get("/api/incidents?column=Country&value=korea")
+        latency = time.perf_counter() - start
+        # Both were served from the current dataset while the child process was still parsing the workbook
+        assert not rebuilt.is_set()
+        assert response.status_code == 200 and response.get_json()["version"] == version
+        assert latency < 0.5
+    finally:
+        thread.join()
+    assert app.dataset["version"] != version and len(app.dataset["df"]) == 60
@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetch_previews import PreviewFetcher
+from preview_store import PreviewStore
+from utils import UNAVAILABLE_TITLE
+
+
+# Local stand-in for the news sites: records every request and how many were in flight per server
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        state = self.server.state
+        with state["lock"]:
+            state["hits"][self.path] += 1
+            hits = state["hits"][self.path]
+            state["in_flight"][self.server.server_port] += 1
+            port = self.server.server_port
+            state["max_in_flight"][port] = max(state["max_in_flight"][port], state["in_flight"][port])
+        try:
+            if self.path.startswith("/slow/"):
+                time.sleep(0.2)
+                self.send_page(f"Slow {self.path}")
+            elif self.path == "/etag":
+                if self.headers.get("If-None-Match") == '"v1"':
+                    self.send_response(304)
+                    self.send_header("ETag", '"v1"')
+                    self.end_headers()
+                else:
+                    self.send_page("Etag page", {"ETag": '"v1"'})
+            elif self.path == "/flaky":
+                if hits == 1:
+                    self.send_error(503)
+                else:
+                    self.send_page("Recovered")
+            elif self.path == "/missing":
+                self.send_error(404)
+            else:
+                self.send_page(f"Page {self.path}")
+        finally:
+            with state["lock"]:
+                state["in_flight"][port] -= 1
+
+    def send_page(self, title, headers=None):
+        body = f"<html><head><title>{title}</title></head><body>text</body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def sites():
+    state = {"lock": threading.Lock(), "hits": Counter(), "in_flight": Counter(), "max_in_flight": Counter()}
+    servers = []
+    for _ in range(2):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        server.state = state
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        servers.append(server)
+    yield [f"http://127.0.0.1:{server.server_port}" for server in servers], servers, state
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PreviewStore(str(tmp_path / "previews.sqlite3"), legacy_json=None)
+
+
+def make_fetcher(**kwargs):
+    return PreviewFetcher(**dict({"workers": 8, "per_host": 2, "retries": 2, "backoff": 0.01, "timeout": 5}, **kwargs))
+
+
+def test_requests_per_host_are_capped(sites, store):
+    bases, servers, state = sites
+    urls = [f"{base}/slow/{i}" for base in bases for i in range(6)]
+
+    fetched = make_fetcher().refresh(urls, store, ttl=3600)
+
+    assert sorted(fetched) == sorted(urls)
+    for server in servers:
+        assert state["max_in_flight"][server.server_port] == 2
+    assert all(store.get(url)["status"] == "ok" for url in urls)
+
+
+def test_only_new_stale_and_unavailable_previews_are_fetched(sites, store):
+    base = sites[0][0]
+    now = time.time()
+    store.put_many({
+        f"{base}/fresh": {"title": "Fresh", "fetched_at": now},
+        f"{base}/stale": {"title": "Stale", "fetched_at": now - 7200},
+        f"{base}/failed": {"title": UNAVAILABLE_TITLE, "fetched_at": now},
+    })
+    urls = [f"{base}/fresh", f"{base}/stale", f"{base}/failed", f"{base}/new"]
+
+    fetched = make_fetcher().refresh(urls, store, ttl=3600)
+
+    assert sorted(fetched) == sorted([f"{base}/stale", f"{base}/failed", f"{base}/new"])
+    hits = sites[2]["hits"]
+    assert hits["/fresh"] == 0
+    assert hits["/stale"] == hits["/failed"] == hits["/new"] == 1
+    assert store.get(f"{base}/fresh")["title"] == "Fresh"
+    assert store.get(f"{base}/stale")["title"] == "Page /stale"
+    assert store.get(f"{base}/failed")["status"] == "ok"
+
+
+def test_unchanged_page_is_revalidated_with_if_none_match(sites, store):
+    url = sites[0][0] + "/etag"
+    fetcher = make_fetcher()
+    fetcher.refresh([url], store, ttl=3600)
+    stored = store.get(url)
+    assert stored["etag"] == '"v1"'
+    # Keep the stored title distinct from the page's, so a 304 visibly reuses it
+    store.put(url, dict(stored, title="Cached title", fetched_at=time.time() - 7200))
+
+    fetched = fetcher.refresh([url], store, ttl=3600)
+
+    assert fetched == [url]
+    assert sites[2]["hits"]["/etag"] == 2
+    revalidated = store.get(url)
+    assert revalidated["title"] == "Cached title"
+    assert revalidated["fetched_at"] > time.time() - 60
+
+
+def test_server_error_is_retried_until_it_succeeds(sites, store):
+    url = sites[0][0] + "/flaky"
+
+    make_fetcher().refresh([url], store, ttl=3600)
+
+    assert sites[2]["hits"]["/flaky"] == 2
+    assert store.get(url)["title"] == "Recovered"
+
+
+def test_client_error_is_not_retried(sites, store):
+    url = sites[0][0] + "/missing"
+
+    make_fetcher().refresh([url], store, ttl=3600)
+
+    assert sites[2]["hits"]["/missing"] == 1
+    assert store.get(url)["status"] == "unavailable"
+
+
+# Records when each batch of previews was written, and which URLs it held
+class RecordingStore(PreviewStore):
+    def __init__(self, path):
+        super().__init__(path, legacy_json=None)
+        self.writes = []
+
+    def put_many(self, previews):
+        super().put_many(previews)
+        self.writes.append((time.perf_counter(), list(previews)))
+
+
+def written_at(store, url):
+    return next(at for at, urls in store.writes if url in urls)
+
+
+def test_previews_are_stored_as_they_complete(sites, tmp_path):
+    base = sites[0][0]
+    store = RecordingStore(str(tmp_path / "previews.sqlite3"))
+    urls = [f"{base}/fast", f"{base}/slow/1"]
+
+    make_fetcher().refresh(urls, store, ttl=3600)
+
+    assert written_at(store, f"{base}/fast") < written_at(store, f"{base}/slow/1")
+
+
+def test_interrupted_run_keeps_the_previews_it_fetched(sites, store):
+    base = sites[0][0]
+
+    class InterruptedFetcher(PreviewFetcher):
+        def fetch(self, url, previous=None):
+            if url.endswith("/interrupt"):
+                time.sleep(0.2)
+                raise KeyboardInterrupt
+            return super().fetch(url, previous)
+
+    urls = [f"{base}/interrupt"] + [f"{base}/page/{i}" for i in range(4)]
+    with pytest.raises(KeyboardInterrupt):
+        InterruptedFetcher(workers=4, per_host=4, backoff=0.01, timeout=5).refresh(urls, store, ttl=3600)
+
+    assert all(store.get(url)["status"] == "ok" for url in urls[1:])
+    assert store.get(urls[0]) is None
+
+
+def test_busy_host_does_not_hold_up_other_hosts(sites, tmp_path):
+    (busy, other), servers, state = sites
+    store = RecordingStore(str(tmp_path / "previews.sqlite3"))
+    start = time.perf_counter()
+    # One host dominates the list; the other host's URLs come last
+    urls = [f"{busy}/slow/{i}" for i in range(6)] + [f"{other}/page/{i}" for i in range(3)]
+
+    make_fetcher(workers=3, per_host=1).refresh(urls, store, ttl=3600)
+
+    # The busy host's pages take 0.2 s each, one at a time; the other host's finish alongside the first
+    assert max(written_at(store, url) for url in urls[6:]) - start < 0.4
+    assert written_at(store, urls[5]) - start >= 1.2
+    assert state["max_in_flight"][servers[0].server_port] == 1
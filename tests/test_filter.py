@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+import app
+
+
+def apply_filter(column, value):
+    payload = {
+        "output": "..filter-spec.data...debug-log.children..",
+        "outputs": [{"id": "filter-spec", "property": "data"}, {"id": "debug-log", "property": "children"}],
+        "inputs": [{"id": "apply-filter", "property": "n_clicks", "value": 1},
+                   {"id": "reset-filter", "property": "n_clicks", "value": 0}],
+        "state": [{"id": "filter-column", "property": "value", "value": column},
+                  {"id": "filter-value", "property": "value", "value": value}],
+        "changedPropIds": ["apply-filter.n_clicks"],
+    }
+    response = app.server.test_client().post("/_dash-update-component", json=payload)
+    assert response.status_code == 200, response.data
+    outputs = json.loads(response.data)["response"]
+    return outputs["filter-spec"]["data"], outputs["debug-log"]["children"]
+
+
+def test_filter_is_applied():
+    spec, message = apply_filter("Country", "korea")
+    assert spec == {"column": "Country", "value": "korea"}
+    assert message == "Filter applied."
+
+
+@pytest.mark.parametrize("value", ["[", "fire ("])
+def test_invalid_pattern_is_reported(value):
+    assert apply_filter("Description", value) == (None, "Invalid filter pattern.")
+
+
+def test_unfilterable_column_is_reported():
+    assert apply_filter("Event Date", "2020") == (None, "Event Date cannot be filtered on.")
+
+
+def test_invalid_numerical_value_is_reported():
+    assert apply_filter("Capacity (MW)", "big") == (None, "Invalid numerical filter value.")
+
+
+@pytest.mark.parametrize("value", ["Korea", " korea ", "KOREA\t"])
+def test_filters_matching_the_same_rows_get_the_same_spec(value):
+    assert app.make_filter_spec(app.dataset, "Country", value) == {"column": "Country", "value": "korea"}
+
+
+def test_regex_filters_keep_their_case():
+    assert app.make_filter_spec(app.dataset, "Description", " Fire|Smoke ") == {"column": "Description", "value": "Fire|Smoke"}
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-Infinity"])
+def test_non_finite_numerical_values_are_rejected(value):
+    with pytest.raises(ValueError):
+        app.make_filter_spec(app.dataset, "Capacity (MW)", value)
+    assert apply_filter("Capacity (MW)", value) == (None, "Invalid numerical filter value.")
+
+
+def test_blank_value_applies_no_filter():
+    assert apply_filter("Country", "   ") == (None, "No filter applied.")
@@ -0,0 +1,102 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ingest import build_frames, normalize_location, parse_coordinates, read_source
+
+NAN = np.nan
+
+# Malformed and edge-case coordinates with the (lat, lon) they parse to
+COORDINATES = [
+    ("36.3400,140.4500", 36.34, 140.45),
+    (" 21.66 , -157.92 ", 21.66, -157.92),
+    ("-90,-180", -90.0, -180.0),
+    ("0,0", 0.0, 0.0),
+    ("+5,-5", 5.0, -5.0),
+    ("1e1,2E1", 10.0, 20.0),
+    # Text after a second comma is ignored
+    ("1,2,3", 1.0, 2.0),
+    # Each coordinate is validated on its own
+    ("45.5,", 45.5, NAN),
+    (",120", NAN, 120.0),
+    ("91,10", NAN, 10.0),
+    ("90.0001,0", NAN, 0.0),
+    ("10,180.5", 10.0, NAN),
+    ("10,abc", 10.0, NAN),
+    ("abc,10", NAN, 10.0),
+    ("inf,1", NAN, 1.0),
+    ("1 2,3", NAN, 3.0),
+    ("nan,nan", NAN, NAN),
+    ("12.5N,45.1E", NAN, NAN),
+    ("1;2", NAN, NAN),
+    ("45.5", NAN, NAN),
+    ("-", NAN, NAN),
+    ("", NAN, NAN),
+    ("unknown", NAN, NAN),
+    (None, NAN, NAN),
+    (NAN, NAN, NAN),
+    (12.5, NAN, NAN),
+]
+
+
+@pytest.mark.parametrize("raw, lat, lon", COORDINATES)
+def test_parse_coordinates(raw, lat, lon):
+    lats, lons = parse_coordinates(pd.Series([raw], dtype=object))
+    np.testing.assert_array_equal(lats, [lat])
+    np.testing.assert_array_equal(lons, [lon])
+
+
+def test_parse_coordinates_maps_shared_strings_back_to_every_row():
+    # Rows at one site share a string, which is parsed once
+    rows = [raw for raw, _, _ in COORDINATES] * 3
+    rows = rows[1::2] + rows[::2]
+    lats, lons = parse_coordinates(pd.Series(rows, dtype=object))
+
+    expected = {repr(raw): (lat, lon) for raw, lat, lon in COORDINATES}
+    np.testing.assert_array_equal(lats, [expected[repr(raw)][0] for raw in rows])
+    np.testing.assert_array_equal(lons, [expected[repr(raw)][1] for raw in rows])
+
+
+def test_parse_coordinates_of_string_dtype_column():
+    lats, lons = parse_coordinates(pd.Series(["1.5,2.5", None, "3,4"], dtype="str"))
+    np.testing.assert_array_equal(lats, [1.5, NAN, 3.0])
+    np.testing.assert_array_equal(lons, [2.5, NAN, 4.0])
+
+
+LOCATIONS = [
+    ("Moss Landing, CA", "Moss Landing CA"),
+    ("  Gangneung-si,  Gangwon ", "Gangneungsi Gangwon"),
+    ("Site #3 (Unit\t2)", "Site 3 Unit 2"),
+    ("St. Louis ,  MO", "St Louis MO"),
+    ("a , , b", "a b"),
+    ("---", ""),
+    ("", ""),
+]
+
+
+@pytest.mark.parametrize("location, expected", LOCATIONS)
+def test_normalize_location(location, expected):
+    assert normalize_location(pd.Series([location], dtype="str")).tolist() == [expected]
+
+
+def test_normalize_location_is_idempotent():
+    locations = pd.Series([location for location, _ in LOCATIONS] + read_source()["Location"].dropna().tolist(), dtype="str")
+    normalized = normalize_location(locations)
+
+    pd.testing.assert_series_equal(normalize_location(normalized), normalized)
+
+
+@pytest.mark.parametrize("text_dtype", ["str", object])
+def test_text_columns_are_found_whatever_their_dtype(text_dtype):
+    raw = read_source()
+    text_columns = list(raw.select_dtypes(exclude="number").columns.drop("Event Date", errors="ignore"))
+    raw = raw.astype({col: text_dtype for col in text_columns})
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        frames = build_frames(raw)
+
+    assert frames["string_cols"] == text_columns
+    assert not frames["df"][text_columns].isna().any().any()
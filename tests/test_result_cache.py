@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+import app
+from result_cache import ResultCache, estimate_size
+from spatial import SpatialIndex
+
+
+def test_entry_bound_evicts_least_recently_used():
+    cache = ResultCache(max_bytes=None, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.total_bytes == 0
+
+
+def test_byte_bound_evicts_until_entries_fit():
+    frame = pd.DataFrame({"x": np.arange(1000, dtype="float64")})
+    size = estimate_size(frame)
+    cache = ResultCache(max_bytes=2 * size)
+    for key in "abc":
+        cache.put(key, frame.copy())
+
+    assert len(cache) == 2 and "a" not in cache
+    assert cache.total_bytes == 2 * size
+    # Larger than the whole budget: returned but not kept
+    cache.put("huge", pd.concat([frame] * 3))
+    assert "huge" not in cache and len(cache) == 2
+
+
+def test_estimate_size_counts_arrays_figures_and_spatial_indexes():
+    lat, lon = np.linspace(-60, 60, 10000), np.linspace(-170, 170, 10000)
+    index = SpatialIndex(lat, lon)
+    figure = go.Figure(go.Scatter(x=lon, y=lat))
+
+    assert estimate_size(lat) == lat.nbytes
+    assert estimate_size(index) >= 6 * lat.nbytes
+    assert estimate_size(figure) >= 2 * lat.nbytes
+
+
+def test_base_maps_are_cached_by_size_apart_from_bar_figures():
+    app.map_cache.clear()
+    app.figure_cache.clear()
+    map_df, figure, _ = app.get_base_map(app.dataset, None)
+
+    assert len(app.map_cache) == 1 and len(app.figure_cache) == 0
+    assert app.map_cache.total_bytes >= estimate_size(map_df) + estimate_size(figure)
+    assert app.get_base_map(app.dataset, None)[1] is figure
@@ -0,0 +1,15 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+TESTS_DIR = os.path.dirname(__file__)
+
+
+# The clientside selection callbacks are JavaScript; their tests run under node
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_selection_js():
+    result = subprocess.run(["node", "--test", os.path.join(TESTS_DIR, "selection.test.js")],
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stdout + result.stderr
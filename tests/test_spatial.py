@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from spatial import SpatialIndex, viewport_bounds, viewport_from_relayout
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(0)
+    n = 2000
+    return rng.uniform(-80, 80, n), rng.uniform(-180, 180, n), rng.integers(1, 10, n).astype(float)
+
+
+def in_bounds(lat, lon, bounds):
+    west, south, east, north = bounds
+    in_lon = (lon >= west) & (lon <= east) if west <= east else (lon >= west) | (lon <= east)
+    return (lat >= south) & (lat <= north) & in_lon
+
+
+@pytest.mark.parametrize("bounds, zoom", [
+    ((-30.0, -20.0, 60.0, 50.0), 3),
+    ((-180.0, -80.0, 180.0, 80.0), 1),
+    ((10.0, 40.0, 12.0, 42.0), 9),
+])
+def test_cluster_totals_match_viewport_mask(points, bounds, zoom):
+    lat, lon, weights = points
+    index = SpatialIndex(lat, lon, weights)
+    mask = in_bounds(lat, lon, bounds)
+
+    clusters = index.clusters(bounds, zoom)
+
+    assert clusters["points"].sum() == mask.sum()
+    assert clusters["weight"].sum() == pytest.approx(weights[mask].sum())
+    np.testing.assert_array_equal(index.query(bounds), np.flatnonzero(mask))
+
+
+def test_single_point_clusters_keep_their_coordinates(points):
+    lat, lon, weights = points
+    index = SpatialIndex(lat, lon, weights)
+
+    clusters = index.clusters((-180.0, -80.0, 180.0, 80.0), 8)
+    single = clusters[clusters["points"] == 1]
+
+    assert len(single) > 0
+    assert (clusters.loc[clusters["points"] > 1, "position"] == -1).all()
+    positions = single["position"].to_numpy()
+    np.testing.assert_allclose(single["lat"], lat[positions])
+    np.testing.assert_allclose(single["lon"], lon[positions])
+    np.testing.assert_allclose(single["weight"], weights[positions])
+
+
+def test_viewport_across_the_antimeridian(points):
+    lat, lon, weights = points
+    index = SpatialIndex(lat, lon, weights)
+    bounds = (170.0, -40.0, -170.0, 40.0)
+    mask = in_bounds(lat, lon, bounds)
+
+    clusters = index.clusters(bounds, 4)
+
+    assert mask.sum() > 0
+    assert clusters["points"].sum() == mask.sum()
+    assert clusters["weight"].sum() == pytest.approx(weights[mask].sum())
+    assert ((clusters["lon"] >= 170.0) | (clusters["lon"] <= -170.0)).all()
+
+
+def test_empty_viewport():
+    index = SpatialIndex([10.0, 20.0], [10.0, 20.0])
+
+    clusters = index.clusters((-100.0, -50.0, -90.0, -40.0), 5)
+
+    assert len(clusters) == 0
+    assert list(clusters.columns) == ["lat", "lon", "points", "weight", "position", "selected"]
+    assert len(SpatialIndex([], []).clusters((-180.0, -80.0, 180.0, 80.0), 2)) == 0
+
+
+def test_selected_point_marks_its_cluster(points):
+    lat, lon, weights = points
+    index = SpatialIndex(lat, lon, weights)
+    bounds = (-180.0, -80.0, 180.0, 80.0)
+    selected = 7
+
+    clusters = index.clusters(bounds, 2, selected=selected)
+
+    marked = clusters[clusters["selected"]]
+    assert len(marked) == 1
+    assert marked["points"].iloc[0] >= 1
+
+
+def test_viewport_from_relayout_without_derived_corners():
+    relayout = {"mapbox.center": {"lat": 36.0, "lon": -100.0}, "mapbox.zoom": 4}
+
+    center, zoom, bounds = viewport_from_relayout(relayout)
+
+    assert center == {"lat": 36.0, "lon": -100.0}
+    assert zoom == 4
+    assert bounds == viewport_bounds(center, zoom)
+
+
+def test_viewport_from_relayout_with_derived_corners():
+    corners = [[-110.0, 45.0], [-90.0, 45.0], [-90.0, 30.0], [-110.0, 30.0]]
+    relayout = {"mapbox.center": {"lat": 38.0, "lon": -100.0}, "mapbox.zoom": 5, "mapbox._derived": {"coordinates": corners}}
+
+    assert viewport_from_relayout(relayout)[2] == (-110.0, 30.0, -90.0, 45.0)
+
+
+def test_viewport_from_relayout_with_corners_across_the_antimeridian():
+    corners = [[170.0, 10.0], [190.0, 10.0], [190.0, -10.0], [170.0, -10.0]]
+    relayout = {"mapbox.center": {"lat": 0.0, "lon": 180.0}, "mapbox.zoom": 5, "mapbox._derived": {"coordinates": corners}}
+
+    assert viewport_from_relayout(relayout)[2] == (170.0, -10.0, -170.0, 10.0)
+
+
+def test_viewport_from_relayout_wider_than_the_world():
+    corners = [[-300.0, 80.0], [300.0, 80.0], [300.0, -80.0], [-300.0, -80.0]]
+    relayout = {"mapbox.center": {"lat": 0.0, "lon": 0.0}, "mapbox.zoom": 0, "mapbox._derived": {"coordinates": corners}}
+
+    assert viewport_from_relayout(relayout)[2] == (-180.0, -80.0, 180.0, 80.0)
+
+
+def test_viewport_from_relayout_needs_center_and_zoom():
+    assert viewport_from_relayout(None) is None
+    assert viewport_from_relayout({"mapbox.zoom": 3}) is None
+    assert viewport_from_relayout({"autosize": True}) is None
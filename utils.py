@@ -1,30 +1,120 @@
-import requests
-from bs4 import BeautifulSoup
+import codecs
+from html.parser import HTMLParser
 from urllib.parse import urlparse
 
-def get_url_preview(url):
+import requests
+
+USER_AGENT = 'Mozilla/5.0'
+UNAVAILABLE_TITLE = 'Preview Unavailable'
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+# Stop reading a page after this many bytes even if </head> was not seen
+HEAD_MAX_BYTES = 512 * 1024
+CHUNK_BYTES = 16 * 1024
+
+
+# Preview for URLs that are never fetched, or None if the URL should be fetched
+def skipped_preview(url):
     if not url or not isinstance(url, str) or not url.strip() or not url.startswith(('http://', 'https://')):
         return {'title': 'Invalid URL', 'description': '', 'image': '', 'url': url or 'N/A'}
 
     if 'box.com' in url.lower():
         return {'title': 'Box.com Link (Preview Skipped)', 'description': '', 'image': '', 'url': url}
+    return None
+
+
+def unavailable_preview(url):
+    return {'title': UNAVAILABLE_TITLE, 'description': '', 'image': '', 'url': url}
+
+
+# Incremental parser for the <head> of a page: collects og: meta tags and <title>
+# and sets `done` once the head is over, so the caller can stop reading the body
+class HeadParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.meta = {}
+        self.title = None
+        self.done = False
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'body':
+            self.done = True
+        elif tag == 'title' and self.title is None:
+            self._in_title = True
+            self.title = ''
+        elif tag == 'meta':
+            attrs = dict(attrs)
+            prop = attrs.get('property')
+            if prop in ('og:title', 'og:description', 'og:image') and prop not in self.meta:
+                self.meta[prop] = attrs.get('content') or ''
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self._in_title = False
+        elif tag == 'head':
+            self.done = True
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+
+
+# Feed the response body to a HeadParser in chunks, stopping after </head> or max_bytes
+def read_head(response, max_bytes=HEAD_MAX_BYTES):
+    try:
+        decoder = codecs.getincrementaldecoder(response_charset(response))(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    parser = HeadParser()
+    received = 0
+    try:
+        for chunk in response.iter_content(chunk_size=CHUNK_BYTES):
+            received += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            if parser.done or received >= max_bytes:
+                break
+    finally:
+        response.close()
+    return parser
+
+
+def response_charset(response):
+    for param in response.headers.get('Content-Type', '').split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'charset' and value:
+            return value.strip('"\'')
+    return 'utf-8'
+
+
+# Build a preview from a successful (streamed) response for `url`
+def parse_preview(url, response):
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    if content_type == 'application/pdf':
+        response.close()
+        return {'title': urlparse(url).netloc or 'PDF Document', 'description': '', 'image': '', 'url': url}
+    # Don't download images, archives and other binaries just to find no <title>
+    if content_type and content_type not in HTML_CONTENT_TYPES:
+        response.close()
+        return {'title': urlparse(url).netloc, 'description': '', 'image': '', 'url': url}
+
+    head = read_head(response)
+    title = head.meta.get('og:title', head.title)
+    return {
+        'title': title[:100] if title is not None else urlparse(url).netloc,
+        'description': head.meta.get('og:description', '')[:200],
+        'image': head.meta.get('og:image', ''),
+        'url': url
+    }
+
+
+def get_url_preview(url):
+    skipped = skipped_preview(url)
+    if skipped:
+        return skipped
 
     try:
-        response = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'}, allow_redirects=True)
+        response = requests.get(url, timeout=10, headers={'User-Agent': USER_AGENT}, allow_redirects=True, stream=True)
         response.raise_for_status()
-        if response.headers.get('Content-Type', '').startswith('application/pdf'):
-            return {'title': urlparse(url).netloc or 'PDF Document', 'description': '', 'image': '', 'url': url}
-        else:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            preview = {
-                'title': soup.find('meta', property='og:title') or soup.find('title'),
-                'description': soup.find('meta', property='og:description'),
-                'image': soup.find('meta', property='og:image'),
-                'url': url
-            }
-            preview['title'] = preview['title'].get('content', preview['title'].text)[:100] if preview['title'] else urlparse(url).netloc
-            preview['description'] = preview['description'].get('content', '')[:200] if preview['description'] else ''
-            preview['image'] = preview['image'].get('content', '') if preview['image'] else ''
-            return preview
+        return parse_preview(url, response)
     except Exception as e:
-        return {'title': 'Preview Unavailable', 'description': '', 'image': '', 'url': url}
\ No newline at end of file
+        return unavailable_preview(url)